@@ -0,0 +1,163 @@
+# bench_plate_grammar.py
+# Equivalence check and microbenchmark: PlateNormalizer vs. the old clean_plate_text,
+# plus a check of known-plate matching on fixed reads.
+import argparse
+import random
+import re
+import sys
+import time
+
+from plate_grammar import BRAND_TOKENS, INDIAN_STATE_CODES, PlateNormalizer
+
+# --- reference: clean_plate_text/fix_ocr_errors as they were before the normalizer ---
+
+def legacy_fix_ocr_errors(text, position):
+    if not text:
+        return text
+    char = text.upper()
+    if position in [0, 1]:
+        if char.isdigit():
+            digit_to_letter = {'0': 'O', '1': 'I', '2': 'Z', '3': 'E',
+                              '4': 'A', '5': 'S', '6': 'G', '8': 'B', '9': 'P'}
+            return digit_to_letter.get(char, char)
+    elif position in [2, 3]:
+        if char.isalpha():
+            letter_to_digit = {'O': '0', 'Q': '0', 'D': '0', 'I': '1',
+                              'L': '1', 'Z': '2', 'S': '5', 'G': '6', 'B': '8'}
+            return letter_to_digit.get(char, char)
+    elif position in [4, 5]:
+        if char.isdigit():
+            digit_to_letter = {'0': 'O', '1': 'I', '2': 'Z', '3': 'E',
+                              '5': 'S', '6': 'G', '8': 'B'}
+            return digit_to_letter.get(char, char)
+    else:
+        if char.isalpha():
+            letter_to_digit = {'O': '0', 'Q': '0', 'D': '0', 'I': '1',
+                              'L': '1', 'Z': '2', 'S': '5', 'G': '6', 'B': '8'}
+            return letter_to_digit.get(char, char)
+    return char
+
+def legacy_clean_plate_text(text, valid_states=INDIAN_STATE_CODES):
+    text = re.sub(r'[^A-Z0-9]', '', text.upper())
+    brands = list(BRAND_TOKENS)
+    for brand in sorted(brands, key=len, reverse=True):
+        text = text.replace(brand, '')
+    patterns = [
+        r'([A-Z]{2})(\d{2})([A-Z]{1,2})(\d{4})',
+        r'([A-Z]{2})(\d{2})([A-Z]{1,2})(\d{3})',
+    ]
+    for pattern in patterns:
+        matches = re.findall(pattern, text)
+        for match in matches:
+            state_code = match[0]
+            if state_code in valid_states:
+                plate = ''.join(match)
+                fixed = ''
+                for i, char in enumerate(plate):
+                    fixed += legacy_fix_ocr_errors(char, i)
+                return fixed
+    if len(text) >= 8:
+        fixed = ''
+        for i, char in enumerate(text[:10]):
+            fixed += legacy_fix_ocr_errors(char, i)
+        for pattern in patterns:
+            match = re.match(pattern, fixed)
+            if match and match.group(1) in valid_states:
+                return ''.join(match.groups())
+    return ""
+
+# --- corpus ---
+
+CONFUSABLE = "0O1IL2Z5S6G8BDQ"
+ALNUM = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+def random_plate(rng):
+    state = rng.choice(sorted(INDIAN_STATE_CODES))
+    series = ''.join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(rng.choice([1, 2])))
+    number = ''.join(rng.choice("0123456789") for _ in range(rng.choice([3, 4])))
+    return f"{state}{rng.randint(1, 99):02d}{series}{number}"
+
+def ocr_noise(rng, text):
+    chars = list(text)
+    for i in range(len(chars)):
+        r = rng.random()
+        if r < 0.08:
+            chars[i] = rng.choice(CONFUSABLE)
+        elif r < 0.10:
+            chars[i] = rng.choice(" -.:|")
+    if rng.random() < 0.3:
+        chars.insert(rng.randrange(len(chars) + 1), rng.choice(BRAND_TOKENS))
+    if rng.random() < 0.2:
+        chars.insert(0, rng.choice(["IND", "ind ", "INDIA", "Maruti Suzuki "]))
+    text = ''.join(chars)
+    return text.lower() if rng.random() < 0.1 else text
+
+def build_corpus(n, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            corpus.append(ocr_noise(rng, random_plate(rng)))
+        elif kind < 0.8:
+            # several OCR fragments glued together, as ocr_plate does
+            corpus.append(''.join(ocr_noise(rng, random_plate(rng))[:rng.randint(2, 8)] for _ in range(3)))
+        elif kind < 0.9:
+            corpus.append(''.join(rng.choice(BRAND_TOKENS + tuple(ALNUM)) for _ in range(rng.randint(2, 8))))
+        else:
+            corpus.append(''.join(rng.choice(ALNUM + " ") for _ in range(rng.randint(0, 16))))
+    return corpus
+
+# (OCR read, known plates, expected match)
+KNOWN_PLATE_CASES = [
+    # greedy cleaning truncates the read, the top hypothesis is the known plate
+    ("MH12A81234", {"MH12AB1234"}, "MH12AB1234"),
+    # known plate is the second hypothesis, within the margin
+    ("KA01M65678", {"KA01MG5678"}, "KA01MG5678"),
+    # a clean read is not swapped for a look-alike (8/3, H/N cost too much)
+    ("MH12AB1234", {"MH12AB1284"}, ""),
+    ("MH12AB1234", {"MN12AB1234"}, ""),
+    ("MH12AB1234", {"MH12AB1234", "MH12AB1284"}, "MH12AB1234"),
+]
+
+def check_known_plates(normalizer):
+    failures = [(read, known, expected, normalizer.match_known([(read, 0.9)], known))
+                for read, known, expected in KNOWN_PLATE_CASES]
+    return [f for f in failures if f[2] != f[3]]
+
+def bench(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    normalizer = PlateNormalizer()
+    corpus = build_corpus(args.n, args.seed)
+
+    mismatches = [(t, legacy_clean_plate_text(t), normalizer.normalize(t)) for t in corpus
+                  if legacy_clean_plate_text(t) != normalizer.normalize(t)]
+    hits = sum(1 for t in corpus if normalizer.normalize(t))
+    print(f"equivalence: {len(corpus) - len(mismatches)}/{len(corpus)} identical ({hits} plates found)")
+    for text, old, new in mismatches[:10]:
+        print(f"  {text!r}: legacy={old!r} new={new!r}")
+
+    known_failures = check_known_plates(normalizer)
+    print(f"known-plate matching: {len(KNOWN_PLATE_CASES) - len(known_failures)}/{len(KNOWN_PLATE_CASES)} as expected")
+    for read, known, expected, got in known_failures:
+        print(f"  {read!r} with {sorted(known)}: expected {expected!r}, got {got!r}")
+
+    old_us = bench(legacy_clean_plate_text, corpus, args.repeat)
+    new_us = bench(normalizer.normalize, corpus, args.repeat)
+    print(f"legacy clean_plate_text: {old_us:7.2f} us/call")
+    print(f"PlateNormalizer:         {new_us:7.2f} us/call  ({old_us / new_us:.1f}x)")
+    sys.exit(1 if mismatches or known_failures else 0)
@@ -8,13 +8,18 @@ c = conn.cursor()
 c.execute("""CREATE TABLE IF NOT EXISTS registered_vehicles(
     id INTEGER PRIMARY KEY,
     plate TEXT UNIQUE,
-    owner TEXT
+    owner TEXT,
+    preferred_zone TEXT
 )""")
 
 c.execute("""CREATE TABLE IF NOT EXISTS parking_slots(
     id INTEGER PRIMARY KEY,
     slot_label TEXT UNIQUE,
-    occupied INTEGER DEFAULT 0
+    occupied INTEGER DEFAULT 0,
+    zone TEXT,
+    level INTEGER DEFAULT 0,
+    x REAL DEFAULT 0,
+    y REAL DEFAULT 0
 )""")
 
 c.execute("""CREATE TABLE IF NOT EXISTS active_parking(
@@ -31,15 +36,19 @@ c.execute("""CREATE TABLE IF NOT EXISTS events_log(
     plate TEXT,
     authorized INTEGER,
     image_path TEXT,
-    event_type TEXT DEFAULT 'entry'
+    event_type TEXT DEFAULT 'entry',
+    original_plate TEXT,
+    lane TEXT,
+    camera_id TEXT
 )""")
 
 # seed example data
 c.execute("INSERT OR IGNORE INTO registered_vehicles(plate, owner) VALUES (?, ?)", ("R183JF", "Demo Owner"))
-c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied) VALUES (?, ?)", ("A1",0))
-c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied) VALUES (?, ?)", ("A2",0))
-c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied) VALUES (?, ?)", ("A3",0))
-c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied) VALUES (?, ?)", ("B1",0))
+# (slot_label, occupied, zone, level, x, y) - x/y are metres from the entry lane
+c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied, zone, level, x, y) VALUES (?, ?, ?, ?, ?, ?)", ("A1",0,"A",0,1,0))
+c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied, zone, level, x, y) VALUES (?, ?, ?, ?, ?, ?)", ("A2",0,"A",0,2,0))
+c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied, zone, level, x, y) VALUES (?, ?, ?, ?, ?, ?)", ("A3",0,"A",0,3,0))
+c.execute("INSERT OR IGNORE INTO parking_slots(slot_label, occupied, zone, level, x, y) VALUES (?, ?, ?, ?, ?, ?)", ("B1",0,"B",0,1,5))
 
 conn.commit()
 conn.close()
@@ -0,0 +1,150 @@
+# evidence_store.py
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+class EvidenceStore:
+    """Audit images for gate events: the plate crop plus a downscaled frame.
+
+    save() returns the frame path straight away; downscaling, JPEG/WebP
+    encoding and disk writes all run on a background pool. Files go to date-sharded
+    directories (root/YYYY/MM/DD/...) and the oldest ones are evicted once
+    the store exceeds max_bytes or they are older than max_age_days.
+
+    For an event the frame is <stem>_full<ext> and the crop <stem>_plate<ext>.
+    """
+
+    def __init__(self, root="evidence", max_bytes=2 * 1024 ** 3, max_age_days=30,
+                 full_width=1280, ext=".jpg", quality=80, workers=2, max_pending=64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.full_width = full_width
+        self.ext = ext
+        if ext == ".webp":
+            self.params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+        else:
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evidence")
+        self.lock = threading.Lock()
+        self.files = deque()     # (mtime, path, size), oldest first
+        self.total_bytes = 0
+        self.pending = 0
+        self.dropped = 0
+        self.counter = 0
+        os.makedirs(root, exist_ok=True)
+        self.pool.submit(self._scan)
+
+    def _scan(self):
+        """Index files already on disk so retention covers previous runs"""
+        found = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        with self.lock:
+            # writes may have landed while we walked the tree
+            seen = {path for _, path, _ in found}
+            self.files = deque(sorted(found + [f for f in self.files if f[1] not in seen]))
+            self.total_bytes = sum(size for _, _, size in self.files)
+        self._evict()
+
+    def save(self, frame, box=None, event_type="entry", plate=None):
+        """Queue evidence for one event; returns the frame path or None if dropped.
+
+        The frame is only referenced, not copied.
+        """
+        if frame is None:
+            return None
+        with self.lock:
+            if self.pending >= self.max_pending:
+                # the disk can't keep up; never make the gate wait for it
+                self.dropped += 1
+                return None
+            self.pending += 1
+            self.counter += 1
+            seq = self.counter
+
+        now = time.time()
+        day_dir = os.path.join(self.root, time.strftime("%Y/%m/%d", time.localtime(now)))
+        tag = re.sub(r'[^A-Z0-9]', '', (plate or "unknown").upper()) or "unknown"
+        stem = os.path.join(day_dir, f"{time.strftime('%H%M%S', time.localtime(now))}_{seq:06d}_{event_type}_{tag}")
+
+        full_path = stem + "_full" + self.ext
+        self.pool.submit(self._write, day_dir, stem, frame, box)
+        return full_path
+
+    def _write(self, day_dir, stem, frame, box):
+        try:
+            h, w = frame.shape[:2]
+            small = frame
+            if self.full_width and w > self.full_width:
+                small = cv2.resize(frame, (self.full_width, max(1, int(h * self.full_width / w))),
+                                   interpolation=cv2.INTER_AREA)
+            crop = None
+            if box is not None:
+                x1, y1, x2, y2 = box
+                crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+            
+            os.makedirs(day_dir, exist_ok=True)
+            written = []
+            for path, img in [(stem + "_full" + self.ext, small), (stem + "_plate" + self.ext, crop)]:
+                if img is None or img.size == 0:
+                    continue
+                ok, buf = cv2.imencode(self.ext, img, self.params)
+                if not ok:
+                    continue
+                with open(path, "wb") as f:
+                    f.write(buf.tobytes())
+                written.append((time.time(), path, len(buf)))
+            with self.lock:
+                self.files.extend(written)
+                self.total_bytes += sum(size for _, _, size in written)
+        except Exception as e:
+            print(f"[ERROR] Evidence write failed: {e}")
+        finally:
+            with self.lock:
+                self.pending -= 1
+        self._evict()
+
+    def _evict(self):
+        """Delete oldest files until the store is within its size/age limits"""
+        cutoff = time.time() - self.max_age if self.max_age else None
+        victims = []
+        with self.lock:
+            while self.files and ((self.max_bytes and self.total_bytes > self.max_bytes) or
+                                  (cutoff is not None and self.files[0][0] < cutoff)):
+                _, path, size = self.files.popleft()
+                self.total_bytes -= size
+                victims.append(path)
+        for path in victims:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            # prune day/month/year directories that are now empty
+            d = os.path.dirname(path)
+            while os.path.abspath(d) != os.path.abspath(self.root):
+                try:
+                    os.rmdir(d)
+                except OSError:
+                    break
+                d = os.path.dirname(d)
+
+    def stats(self):
+        with self.lock:
+            return {"files": len(self.files), "bytes": self.total_bytes,
+                    "pending": self.pending, "dropped": self.dropped}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,140 @@
+# frame_ingest.py
+import re
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+
+def decode_jpeg(buf):
+    """Decode JPEG/PNG bytes (bytes, bytearray or memoryview) straight from memory"""
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    if arr.size == 0:
+        raise ValueError("empty image body")
+    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("could not decode image")
+    return img
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+
+def multipart_field(body, content_type, field="image"):
+    """Return a memoryview of one multipart/form-data part without copying it.
+
+    Only the part headers are parsed; the payload is sliced out of the
+    request buffer so it can go straight to decode_jpeg.
+    """
+    m = _BOUNDARY.search(content_type or "")
+    if not m:
+        raise ValueError("multipart body without boundary")
+    delim = b"--" + m.group(1).encode()
+    view = memoryview(body)
+    pos = body.find(delim)
+    while pos != -1:
+        start = pos + len(delim)
+        end = body.find(delim, start)
+        if end == -1:
+            break
+        head_end = body.find(b"\r\n\r\n", start, end)
+        if head_end != -1:
+            headers = bytes(view[start:head_end]).decode("latin-1")
+            # the disposition's own name= parameter, not filename="..."
+            if re.search(r'(?im)^content-disposition:[^\r\n]*;\s*name="%s"' % re.escape(field), headers):
+                # payload ends with the CRLF that precedes the next delimiter
+                return view[head_end + 4:end - 2]
+        pos = end
+    raise ValueError(f"multipart field '{field}' not found")
+
+class SharedFrameRing:
+    """Ring of raw BGR frames in multiprocessing.shared_memory.
+
+    A co-located capture process creates the ring and write()s frames; the
+    server attaches by name and read()s them as numpy views on the shared
+    buffer, so a frame crosses the process boundary without being copied or
+    serialized. A view stays valid until the producer wraps around the ring
+    (slots - 1 further frames); is_current() tells whether that happened.
+
+    Layout: int64 header [latest_seq, slots, max_h, max_w] followed by one
+    [seq, h, w, c] row per slot, then the frame slots.
+    """
+    HEADER = 4
+
+    def __init__(self, name, create=False, slots=8, max_shape=(2160, 3840, 3)):
+        self.max_bytes = int(np.prod(max_shape))
+        if create:
+            size = (self.HEADER + 4 * slots) * 8 + slots * self.max_bytes
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._map(slots)
+            self.header[:] = (-1, slots, max_shape[0], max_shape[1])
+            self.index[:] = 0
+            self.index[:, 0] = -1
+        else:
+            self.shm = _attach(name)
+            slots = int(np.ndarray((self.HEADER,), np.int64, buffer=self.shm.buf)[1])
+            self.max_bytes = (self.shm.size - (self.HEADER + 4 * slots) * 8) // slots
+            self._map(slots)
+        self.owner = create
+
+    def _map(self, slots):
+        self.slots = slots
+        self.header = np.ndarray((self.HEADER,), np.int64, buffer=self.shm.buf)
+        self.index = np.ndarray((slots, 4), np.int64, buffer=self.shm.buf, offset=self.HEADER * 8)
+        self.data_offset = (self.HEADER + 4 * slots) * 8
+
+    def _slot_view(self, slot, shape):
+        offset = self.data_offset + slot * self.max_bytes
+        return np.ndarray(shape, np.uint8, buffer=self.shm.buf, offset=offset)
+
+    def write(self, frame):
+        """Copy one frame into the next slot; returns its sequence number"""
+        if frame.dtype != np.uint8 or frame.nbytes > self.max_bytes:
+            raise ValueError("frame does not fit the ring")
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+        seq = int(self.header[0]) + 1
+        slot = seq % self.slots
+        self.index[slot, 0] = -1  # mark slot as being written
+        self._slot_view(slot, frame.shape)[...] = frame
+        self.index[slot, 1:] = frame.shape
+        self.index[slot, 0] = seq
+        self.header[0] = seq
+        return seq
+
+    def read(self, seq=None):
+        """Zero-copy view of frame seq (default: the latest one)"""
+        if seq is None:
+            seq = int(self.header[0])
+        if seq < 0:
+            raise LookupError("no frame written yet")
+        slot = seq % self.slots
+        if int(self.index[slot, 0]) != seq:
+            raise LookupError(f"frame {seq} no longer in ring")
+        h, w, c = (int(v) for v in self.index[slot, 1:])
+        frame = self._slot_view(slot, (h, w, c))
+        return frame[:, :, 0] if c == 1 else frame
+
+    def __reduce__(self):
+        # handing a ring to a spawned process re-attaches it by name
+        return (SharedFrameRing, (self.shm.name,))
+
+    def latest(self):
+        return int(self.header[0])
+
+    def is_current(self, seq):
+        return int(self.index[seq % self.slots, 0]) == seq
+
+    def close(self):
+        # drop numpy views before releasing the mapping
+        self.header = self.index = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track=; stop the resource tracker from
+        # unlinking the producer's segment when this process exits
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
@@ -0,0 +1,79 @@
+# gate_debounce.py
+import threading
+import time
+
+class _Run:
+    """One in-progress read/decide on a key, shared with triggers that join it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class GateDebouncer:
+    """Collapses repeated gate triggers for the same car into one decision.
+
+    Keys are (event, lane). run(key, read, decide) runs read(), the
+    camera/OCR step, and decide(), the step with side effects (slot
+    allocation, event log). A trigger that arrives while a run on its key
+    is in progress waits for it and gets its result: the barrier is still
+    closed, so it is the same car. After the run has finished, a trigger
+    reads its own frame; decide() is skipped when it reads the plate decided
+    on that key within `window` seconds (a car idling at the barrier keeps
+    firing the PIR). Reused results are copies marked "debounced": True.
+    A different plate is always decided afresh.
+    """
+
+    def __init__(self, window=10.0):
+        self.window = window
+        self.lock = threading.Lock()
+        self.running = {}  # key -> _Run in progress
+        self.recent = {}   # key -> (finished_at, plate, result)
+
+    def run(self, key, read, decide):
+        """read() -> (plate, extra); decide(plate, extra) -> result dict"""
+        with self.lock:
+            current = self.running.get(key)
+            joined = current is not None
+            if not joined:
+                current = self.running[key] = _Run()
+        if joined:
+            current.done.wait()
+            if current.error is not None:
+                raise current.error
+            return dict(current.result, debounced=True)
+
+        try:
+            current.result = self._read_and_decide(key, read, decide)
+            return current.result
+        except BaseException as e:
+            current.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.running[key]
+            current.done.set()
+
+    def _read_and_decide(self, key, read, decide):
+        plate, extra = read()
+        with self.lock:
+            recent = self.recent.get(key)
+        if plate and recent and recent[1] == plate and time.monotonic() - recent[0] < self.window:
+            return dict(recent[2], debounced=True)
+
+        result = decide(plate, extra)
+        with self.lock:
+            if plate:
+                self.recent[key] = (time.monotonic(), plate, result)
+            # drop stale entries so the map doesn't grow with lanes * time
+            cutoff = time.monotonic() - self.window
+            for k in [k for k, (t, _, _) in self.recent.items() if t < cutoff]:
+                del self.recent[k]
+        return result
+
+    def forget_plate(self, plate, event=None):
+        """End the window for a plate whose gate cycle finished (exit, slot sensor)"""
+        with self.lock:
+            for k in [k for k, (_, p, _) in self.recent.items()
+                      if p == plate and (event is None or k[0] == event)]:
+                del self.recent[k]
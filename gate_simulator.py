@@ -0,0 +1,549 @@
+# gate_simulator.py
+# Load generator that stands in for the ESP32 gate controllers
+# (sketch_oct5a) and their cameras, so the server can be load-tested
+# without hardware.
+#
+#   python gate_simulator.py preloaded_images --lanes entry --rates 2,4,8 --duration 120
+#   python gate_simulator.py corpus --camera mjpeg --lanes north,south --plates corpus/plates.csv
+#
+# Every lane is one simulated ESP32: a single thread working through its PIR
+# triggers in order, exactly like the sketch's loop(). An authorized entry
+# holds the lane for --gate-hold seconds (gate open), a refusal for the red
+# blink. Vehicles are the corpus images; they arrive at each lane as a
+# Poisson process, stay for an exponential dwell time and leave through the
+# exit gate of a random lane. Parked cars report their slot with slot_update,
+# and --sensor-exits of them leave through the slot sensor instead of the
+# exit camera.
+#
+# Cameras (--camera):
+#   preloaded  send image_name; the corpus must be the server's IMAGE_DIR
+#   upload     POST the JPEG to /api/entry_frame and /api/exit_frame
+#   mjpeg      serve each lane's current car as an MJPEG stream and send
+#              capture_mode "wificam" with its URL (what an IP camera does)
+#
+# Lanes must exist in the server's LANES: the server serializes and debounces
+# triggers per lane, so simulated gates sharing a lane would interfere. Every
+# simulated trigger is a different car, so a "debounced" reply, or a plate
+# that is already parked under another car, is reported as a problem.
+import argparse
+import csv
+import heapq
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def load_corpus(image_dir, plates_csv=None):
+    """[(image name, expected plate or None)]; plates.csv rows are image,plate"""
+    expected = {}
+    if plates_csv:
+        with open(plates_csv, newline="") as f:
+            for row in csv.DictReader(f):
+                expected[row["image"]] = row["plate"].strip().upper()
+    names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(IMAGE_EXTS))
+    return [(name, expected.get(name)) for name in names]
+
+def jpeg_bytes(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] == b"\xff\xd8":
+        return data
+    import cv2
+    ok, buf = cv2.imencode(".jpg", cv2.imread(path))
+    if not ok:
+        raise ValueError(f"cannot encode {path}")
+    return buf.tobytes()
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return float("nan")
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p * len(sorted_values) / 100.0) - 1))
+    return sorted_values[k]
+
+class FakeCameras:
+    """MJPEG streams at /cam/<lane>/<entry|exit>, each showing its current frame"""
+
+    def __init__(self, host="127.0.0.1", port=8090, fps=10):
+        self.frames = {}
+        self.lock = threading.Lock()
+        cams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 3 or parts[0] != "cam":
+                    self.send_error(404)
+                    return
+                key = (parts[1], parts[2])
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                try:
+                    while True:
+                        with cams.lock:
+                            frame = cams.frames.get(key)
+                        if frame is not None:
+                            self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                             + f"Content-Length: {len(frame)}\r\n\r\n".encode()
+                                             + frame + b"\r\n")
+                        time.sleep(1.0 / fps)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def show(self, lane, gate, frame):
+        with self.lock:
+            self.frames[(lane, gate)] = frame
+
+    def url(self, lane, gate):
+        return f"{self.base_url}/cam/{lane}/{gate}"
+
+    def close(self):
+        self.server.shutdown()
+
+class Stats:
+    """Latencies, outcomes and consistency findings, per load phase"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)     # (phase, kind) -> request seconds
+        self.e2e = defaultdict(list)         # (phase, kind) -> trigger-to-response seconds
+        self.outcomes = defaultdict(Counter) # (phase, kind) -> outcome counts
+        self.problems = Counter()            # consistency findings, whole run
+        self.examples = defaultdict(list)
+
+    def add(self, phase, kind, request_s, e2e_s, outcome):
+        with self.lock:
+            self.latency[(phase, kind)].append(request_s)
+            self.e2e[(phase, kind)].append(e2e_s)
+            self.outcomes[(phase, kind)][outcome] += 1
+
+    def problem(self, name, detail):
+        with self.lock:
+            self.problems[name] += 1
+            if len(self.examples[name]) < 5:
+                self.examples[name].append(detail)
+
+class Simulator:
+    def __init__(self, args, corpus):
+        self.args = args
+        self.server = args.server.rstrip("/")
+        self.rng = random.Random(args.seed)
+        self.corpus = corpus
+        self.image_dir = args.corpus
+        self.stats = Stats()
+        self.lock = threading.Lock()
+        self.idle = set(range(len(corpus)))   # vehicles not on site
+        self.parked = {}                      # plate -> slot, as the server told us
+        self.slot_owner = {}                  # slot -> plate
+        self.plate_vehicle = {}               # plate -> vehicle parked under it
+        self.last_vehicle = {}                # (lane, gate) -> vehicle of the previous trigger
+        self.events = []                      # heap of (time, seq, lane, kind, vehicle)
+        self.seq = 0
+        self.phase = 0
+        self.lane_queues = {lane: queue.Queue() for lane in args.lanes}
+        self.sensor_queue = queue.Queue()
+        self.unserved = Counter()             # phase -> triggers still queued at the end
+        self.skipped = Counter()              # phase -> arrivals with every vehicle on site
+        self.baseline = None                  # server's active parkings before the run
+        self.frames = {}
+        self.cameras = None
+        if args.camera in ("upload", "mjpeg"):
+            self.frames = {i: jpeg_bytes(os.path.join(self.image_dir, name))
+                           for i, (name, _) in enumerate(corpus)}
+        if args.camera == "mjpeg":
+            self.cameras = FakeCameras(args.camera_host, args.camera_port, args.camera_fps)
+
+    # --- HTTP -------------------------------------------------------------
+
+    def call(self, method, path, body=None, content_type="application/json"):
+        """(status, parsed JSON or None, seconds); status 0 = no response"""
+        data = None
+        if body is not None:
+            data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        req = urllib.request.Request(self.server + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", content_type)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.args.timeout) as resp:
+                payload = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            return e.code, None, time.perf_counter() - start
+        except (urllib.error.URLError, OSError):
+            return 0, None, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        try:
+            return status, json.loads(payload), elapsed
+        except ValueError:
+            return status, None, elapsed
+
+    def gate_request(self, lane, gate, vehicle):
+        name = self.corpus[vehicle][0]
+        camera = self.args.camera
+        if camera == "upload":
+            return self.call("POST", f"/api/{gate}_frame?lane={lane}", self.frames[vehicle], "image/jpeg")
+        body = {"lane": lane}
+        if camera == "preloaded":
+            body.update(capture_mode="preloaded", image_name=name)
+        else:
+            self.cameras.show(lane, gate, self.frames[vehicle])
+            body.update(capture_mode="wificam", cam_url=self.cameras.url(lane, gate))
+        return self.call("POST", f"/api/{gate}_request", body)
+
+    # --- event schedule ---------------------------------------------------
+
+    def schedule(self, at, lane, kind, vehicle=None):
+        with self.lock:
+            self.seq += 1
+            heapq.heappush(self.events, (at, self.seq, lane, kind, vehicle))
+
+    def schedule_arrival(self, lane, now, rate_per_min):
+        if rate_per_min > 0:
+            self.schedule(now + self.rng.expovariate(rate_per_min / 60.0), lane, "arrival")
+
+    def dispatch(self, until, rate_per_min):
+        """Release due events to the lane workers until `until` (monotonic)"""
+        while True:
+            now = time.monotonic()
+            with self.lock:
+                due = self.events and self.events[0][0] <= now
+                if due:
+                    at, _, lane, kind, vehicle = heapq.heappop(self.events)
+                next_at = self.events[0][0] if self.events else None
+            if due:
+                if kind == "arrival":
+                    self.schedule_arrival(lane, at, rate_per_min)
+                    with self.lock:
+                        vehicle = self.rng.choice(sorted(self.idle)) if self.idle else None
+                        if vehicle is not None:
+                            self.idle.discard(vehicle)
+                    if vehicle is None:
+                        self.skipped[self.phase] += 1
+                        continue
+                    self.lane_queues[lane].put(("entry", vehicle, at, self.phase))
+                elif kind == "park":
+                    self.sensor_queue.put((lane, vehicle, 1, at, self.phase))
+                elif kind == "leave":
+                    self.depart(vehicle[0], vehicle[1], at)
+                continue
+            if now >= until:
+                return
+            time.sleep(min(0.05, max(0.0, (next_at or until) - now), until - now))
+
+    # --- vehicles ---------------------------------------------------------
+
+    def sensor(self, slot, plate, occupied, triggered, phase):
+        with self.lock:
+            if self.parked.get(plate) != slot:
+                return  # the car left (or was re-read) before its sensor fired
+        status, body, elapsed = self.call("POST", "/api/slot_update",
+                                          {"slot_label": slot, "occupied": occupied})
+        outcome = "ok" if status == 200 else ("no_response" if status == 0 else f"http_{status}")
+        self.stats.add(phase, "slot_update", elapsed, time.monotonic() - triggered, outcome)
+        if occupied == 0:
+            # the car is gone either way; only the server's booking may linger
+            with self.lock:
+                if status == 200:
+                    self.parked.pop(plate, None)
+                    self.slot_owner.pop(slot, None)
+                vehicle = self.plate_vehicle.pop(plate, None)
+                if vehicle is not None:
+                    self.idle.add(vehicle)
+
+    def sensor_worker(self):
+        while True:
+            item = self.sensor_queue.get()
+            if item is None:
+                return
+            try:
+                self.sensor(*item)
+            except Exception as e:
+                print(f"[ERROR] slot_update {item[0]}: {e}")
+
+    def depart(self, plate, slot, triggered):
+        with self.lock:
+            vehicle = self.plate_vehicle.get(plate)
+        if vehicle is None:
+            return  # already let out after a failed exit
+        if self.rng.random() < self.args.sensor_exits:
+            # car leaves through the slot sensor only; the server frees the slot
+            self.sensor_queue.put((slot, plate, 0, triggered, self.phase))
+        else:
+            lane = self.rng.choice(self.args.lanes)
+            self.lane_queues[lane].put(("exit", vehicle, triggered, self.phase))
+
+    def expected_plate(self, vehicle):
+        return self.corpus[vehicle][1]
+
+    def handle_entry(self, lane, vehicle, triggered, phase):
+        status, body, elapsed = self.gate_request(lane, "entry", vehicle)
+        e2e = time.monotonic() - triggered
+        if status != 200 or body is None:
+            self.stats.add(phase, "entry", elapsed, e2e, "no_response" if status == 0 else f"http_{status}")
+            with self.lock:
+                self.idle.add(vehicle)
+            return self.args.error_hold
+        plate = body.get("plate")
+        outcome = "authorized" if body.get("authorized") else body.get("reason", "refused")
+        if body.get("debounced"):
+            outcome += " (debounced)"
+        self.stats.add(phase, "entry", elapsed, e2e, outcome)
+        self.check_debounced(lane, "entry", vehicle, body)
+
+        expected = self.expected_plate(vehicle)
+        if expected and plate != expected:
+            self.stats.problem("misread_entry", f"{self.corpus[vehicle][0]}: read {plate}, expected {expected}")
+
+        if not body.get("authorized"):
+            with self.lock:
+                self.idle.add(vehicle)
+            return self.args.refuse_hold
+
+        slot = body.get("slot")
+        with self.lock:
+            owner = self.slot_owner.get(slot)
+            if owner is not None and owner != plate:
+                self.stats.problem("double_allocation", f"{slot} given to {plate} while held by {owner}")
+            if plate in self.parked and self.parked[plate] != slot:
+                self.stats.problem("duplicate_entry", f"{plate} entered again: {self.parked[plate]} -> {slot}")
+            if plate in self.plate_vehicle and self.plate_vehicle[plate] != vehicle:
+                other = self.plate_vehicle[plate]
+                self.stats.problem("plate_for_other_vehicle",
+                                   f"{self.corpus[vehicle][0]} let in as {plate}, "
+                                   f"already parked for {self.corpus[other][0]}")
+                # the earlier car can no longer leave under its plate
+                self.idle.add(other)
+            self.parked[plate] = slot
+            self.slot_owner[slot] = plate
+            self.plate_vehicle[plate] = vehicle
+        now = time.monotonic()
+        if self.args.park_delay >= 0:
+            self.schedule(now + self.args.park_delay, slot, "park", plate)
+        self.schedule(now + self.rng.expovariate(1.0 / self.args.dwell), None, "leave", (plate, slot))
+        return self.args.gate_hold
+
+    def check_debounced(self, lane, gate, vehicle, body):
+        """A debounced reply is only right for the car that triggered last time"""
+        with self.lock:
+            previous = self.last_vehicle.get((lane, gate))
+            self.last_vehicle[(lane, gate)] = vehicle
+        if body.get("debounced") and previous != vehicle:
+            prev_name = self.corpus[previous][0] if previous is not None else None
+            self.stats.problem("debounced_new_arrival",
+                               f"{lane} {gate}: {self.corpus[vehicle][0]} got the reply for "
+                               f"{prev_name} ({body.get('plate')})")
+
+    def handle_exit(self, lane, vehicle, triggered, phase):
+        status, body, elapsed = self.gate_request(lane, "exit", vehicle)
+        e2e = time.monotonic() - triggered
+        with self.lock:
+            plate = next((p for p, v in self.plate_vehicle.items() if v == vehicle), None)
+        if status != 200 or body is None:
+            self.stats.add(phase, "exit", elapsed, e2e, "no_response" if status == 0 else f"http_{status}")
+            self.abandon(plate, vehicle)
+            return self.args.error_hold
+        outcome = "success" if body.get("success") else body.get("reason", "refused")
+        if body.get("debounced"):
+            outcome += " (debounced)"
+        self.stats.add(phase, "exit", elapsed, e2e, outcome)
+        self.check_debounced(lane, "exit", vehicle, body)
+
+        if not body.get("success"):
+            self.abandon(plate, vehicle)
+            return self.args.refuse_hold
+        read, slot = body.get("plate"), body.get("slot")
+        with self.lock:
+            if read != plate:
+                self.stats.problem("exit_wrong_plate", f"{plate} left but {read} was checked out")
+            elif self.parked.get(plate) != slot:
+                self.stats.problem("exit_slot_mismatch", f"{plate} parked in {self.parked.get(plate)}, freed {slot}")
+            freed = self.parked.pop(read, None)
+            if freed is not None:
+                self.slot_owner.pop(freed, None)
+            self.plate_vehicle.pop(plate, None)
+            self.idle.add(vehicle)
+        return self.args.exit_hold
+
+    def abandon(self, plate, vehicle):
+        """Exit gate failed: the car is let out by hand, its slot stays booked"""
+        self.stats.problem("stuck_parking", f"{plate} could not check out")
+        with self.lock:
+            self.plate_vehicle.pop(plate, None)
+            self.idle.add(vehicle)
+
+    def lane_worker(self, lane):
+        q = self.lane_queues[lane]
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            gate, vehicle, triggered, phase = item
+            try:
+                if gate == "entry":
+                    hold = self.handle_entry(lane, vehicle, triggered, phase)
+                else:
+                    hold = self.handle_exit(lane, vehicle, triggered, phase)
+            except Exception as e:
+                print(f"[ERROR] {lane} {gate}: {e}")
+                hold = self.args.error_hold
+            time.sleep(hold)
+
+    # --- run --------------------------------------------------------------
+
+    def server_parked(self):
+        status, active, _ = self.call("GET", "/api/active_parking")
+        if status != 200 or active is None:
+            return None
+        return {a["plate"]: a["slot"] for a in active["active"]}
+
+    def run(self):
+        self.baseline = self.server_parked()
+        workers = [threading.Thread(target=self.lane_worker, args=(lane,), daemon=True)
+                   for lane in self.args.lanes]
+        workers.append(threading.Thread(target=self.sensor_worker, daemon=True))
+        for w in workers:
+            w.start()
+        for self.phase, rate in enumerate(self.args.rates):
+            print(f"phase {self.phase}: {rate}/min per lane for {self.args.duration:.0f}s")
+            start = time.monotonic()
+            with self.lock:
+                # drop the previous phase's pending arrivals, keep departures
+                self.events = [e for e in self.events if e[3] != "arrival"]
+                heapq.heapify(self.events)
+            for lane in self.args.lanes:
+                self.schedule_arrival(lane, start, rate)
+            self.dispatch(start + self.args.duration, rate)
+            backlog = sum(q.qsize() for q in self.lane_queues.values())
+            print(f"  queued triggers at end of phase: {backlog}")
+        # triggers the gates never got to are the clearest sign of saturation
+        for lane, q in self.lane_queues.items():
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                self.unserved[item[3]] += 1
+            q.put(None)
+        self.sensor_queue.put(None)
+        for w in workers:
+            w.join()
+        if self.cameras:
+            self.cameras.close()
+
+    def check_server_state(self):
+        """Compare the server's slots and active parking with each other and with us"""
+        s_status, slots, _ = self.call("GET", "/api/slots")
+        a_status, active, _ = self.call("GET", "/api/active_parking")
+        if s_status != 200 or a_status != 200 or slots is None or active is None:
+            self.stats.problem("state_unavailable", f"/api/slots {s_status}, /api/active_parking {a_status}")
+            return
+        occupied = {s["slot_label"] for s in slots["slots"] if s["occupied"]}
+        held = Counter(a["slot"] for a in active["active"])
+        for slot, n in held.items():
+            if n > 1:
+                self.stats.problem("slot_held_twice", f"{slot} held by {n} active parkings")
+            if slot not in occupied:
+                self.stats.problem("active_slot_not_occupied", f"{slot} in active_parking but marked free")
+        for slot in occupied - set(held):
+            self.stats.problem("occupied_without_parking", f"{slot} occupied with no active parking")
+        server_parked = {a["plate"]: a["slot"] for a in active["active"]}
+        with self.lock:
+            for plate, slot in self.parked.items():
+                if server_parked.get(plate) != slot:
+                    self.stats.problem("lost_parking", f"{plate} in {slot}, server has {server_parked.get(plate)}")
+            if self.baseline is not None:
+                # bookings made during the run that no car is parked under
+                for plate, slot in server_parked.items():
+                    if plate not in self.parked and plate not in self.baseline:
+                        self.stats.problem("leaked_parking", f"{plate} still booked in {slot}")
+        print(f"server state: {len(occupied)} occupied slots, {len(server_parked)} active parkings, "
+              f"{len(self.parked)} cars parked by the simulator")
+
+    def report(self):
+        kinds = ("entry", "exit", "slot_update")
+        print()
+        print(f"{'phase':>5} {'rate/min':>8} {'kind':<11} {'n':>6} {'req/s':>6} {'err%':>6} "
+              f"{'p50':>7} {'p90':>7} {'p99':>7} {'max':>7} {'e2e p50':>8} {'e2e p99':>8}")
+        for phase, rate in enumerate(self.args.rates):
+            for kind in kinds:
+                lat = sorted(self.stats.latency.get((phase, kind), []))
+                if not lat:
+                    continue
+                e2e = sorted(self.stats.e2e[(phase, kind)])
+                outcomes = self.stats.outcomes[(phase, kind)]
+                errors = sum(n for o, n in outcomes.items() if o == "no_response" or o.startswith("http_"))
+                print(f"{phase:>5} {rate:>8g} {kind:<11} {len(lat):>6} {len(lat) / self.args.duration:>6.2f} "
+                      f"{100.0 * errors / len(lat):>6.1f} "
+                      + " ".join(f"{percentile(lat, p) * 1e3:>7.0f}" for p in (50, 90, 99))
+                      + f" {lat[-1] * 1e3:>7.0f} {percentile(e2e, 50) * 1e3:>8.0f} {percentile(e2e, 99) * 1e3:>8.0f}")
+        print("(latencies in ms; e2e includes the wait for a busy gate)")
+        for phase, n in sorted(self.unserved.items()):
+            print(f"phase {phase}: {n} triggers still queued when the run ended")
+        for phase, n in sorted(self.skipped.items()):
+            print(f"phase {phase}: {n} arrivals skipped, every corpus vehicle was on site")
+        print()
+        for (phase, kind), outcomes in sorted(self.stats.outcomes.items()):
+            print(f"phase {phase} {kind}: " + ", ".join(f"{o}={n}" for o, n in outcomes.most_common()))
+        print()
+        if not self.stats.problems:
+            print("consistency: no problems found")
+        for name, n in self.stats.problems.most_common():
+            print(f"consistency: {name} x{n}")
+            for detail in self.stats.examples[name]:
+                print(f"    {detail}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("corpus", help="directory of car images")
+    ap.add_argument("--plates", help="csv with image,plate rows to check reads against")
+    ap.add_argument("--server", default="http://127.0.0.1:8000")
+    ap.add_argument("--lanes", default="entry", help="comma-separated lane names (server LANES)")
+    ap.add_argument("--camera", choices=["preloaded", "upload", "mjpeg"], default="preloaded")
+    ap.add_argument("--camera-host", default="127.0.0.1", help="address the server reaches mjpeg cameras on")
+    ap.add_argument("--camera-port", type=int, default=8090)
+    ap.add_argument("--camera-fps", type=float, default=10)
+    ap.add_argument("--rates", default="2", help="arrivals/min per lane; a list runs one phase per rate")
+    ap.add_argument("--duration", type=float, default=60, help="seconds per phase")
+    ap.add_argument("--dwell", type=float, default=120, help="mean parking time, seconds")
+    ap.add_argument("--park-delay", type=float, default=10,
+                    help="seconds from entry to slot_update occupied=1 (negative: never)")
+    ap.add_argument("--sensor-exits", type=float, default=0.0,
+                    help="fraction of departures freed by slot_update occupied=0 instead of the exit gate")
+    ap.add_argument("--gate-hold", type=float, default=5.0, help="gate open time after an authorized entry")
+    ap.add_argument("--refuse-hold", type=float, default=1.8, help="red blink after a refusal")
+    ap.add_argument("--exit-hold", type=float, default=0.8, help="green blink after an exit")
+    ap.add_argument("--error-hold", type=float, default=0.5, help="error blink after a failed request")
+    ap.add_argument("--timeout", type=float, default=30)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    args.lanes = [l.strip() for l in args.lanes.split(",") if l.strip()]
+    args.rates = [float(r) for r in args.rates.split(",")]
+
+    corpus = load_corpus(args.corpus, args.plates)
+    if not corpus:
+        raise SystemExit(f"no images in {args.corpus}")
+    print(f"{len(corpus)} vehicles, lanes {', '.join(args.lanes)}, camera {args.camera}, server {args.server}")
+
+    sim = Simulator(args, corpus)
+    sim.run()
+    sim.check_server_state()
+    sim.report()
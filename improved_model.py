@@ -1,12 +1,16 @@
 # improved_model.py
 import os
+import math
 import cv2
 import torch
 import numpy as np
 import torchvision.transforms as T
 import easyocr
-import re
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from plate_grammar import INDIAN_STATE_CODES, KNOWN_PLATE_MARGIN, PlateNormalizer, StandardIndianFormat
+from variant_selector import VariantSelector
+from plate_verifier import PlateVerifier
 
 class CustomPlateNet(torch.nn.Module):
     def __init__(self):
@@ -29,20 +33,38 @@ class CustomPlateNet(torch.nn.Module):
     def forward(self, x):
         return self.fc(self.features(x))
 
+# OCR preprocessing variants, in the order they are tried without statistics
+PREPROCESS_VARIANTS = ("otsu", "adaptive", "clahe_otsu", "inverted", "gray")
+
+def scaled_kernel(size, scale, odd=False):
+    """Kernel side for a native-pixel size at a downscaled level"""
+    k = max(1, int(round(size * scale)))
+    if odd and k % 2 == 0:
+        k += 1
+    return k
+
 class ImprovedPlateDetectorOCR:
-    def __init__(self, model_path="custom_plate_model.pth", device=None):
+    def __init__(self, model_path="custom_plate_model.pth", device=None, plate_formats=None,
+                 detect_max_width=None, verifier_path="plate_verifier.npz"):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.transform = T.Compose([T.ToTensor()])
         self.reader = easyocr.Reader(['en'], gpu=torch.cuda.is_available())
         self.model = None
         
+        # Candidate search runs on a copy downscaled to at most this width
+        # (None = native resolution); OCR always reads native pixels
+        self.detect_max_width = detect_max_width
+        
         # Valid Indian state codes
-        self.valid_states = {
-            'AN', 'AP', 'AR', 'AS', 'BR', 'CH', 'CG', 'DD', 'DL', 'DN',
-            'GA', 'GJ', 'HP', 'HR', 'JH', 'JK', 'KA', 'KL', 'LA', 'LD',
-            'MH', 'ML', 'MN', 'MP', 'MZ', 'NL', 'OD', 'OR', 'PB', 'PY',
-            'RJ', 'SK', 'TN', 'TR', 'TS', 'UK', 'UP', 'WB'
-        }
+        self.valid_states = set(INDIAN_STATE_CODES)
+        
+        # Plate grammar; pass e.g. [StandardIndianFormat(), BharatSeriesFormat()] to extend
+        if plate_formats is None:
+            plate_formats = [StandardIndianFormat(self.valid_states)]
+        self.normalizer = PlateNormalizer(plate_formats)
+        
+        # Learns which preprocessing variants produce accepted plates per camera
+        self.variant_selector = VariantSelector(PREPROCESS_VARIANTS)
         
         if os.path.exists(model_path):
             try:
@@ -55,8 +77,17 @@ class ImprovedPlateDetectorOCR:
                 self.model = None
         else:
             print("[model] Using enhanced heuristic-based detection")
+        
+        # Optional HOG+SVM check that drops non-plate candidates before OCR
+        self.verifier = None
+        if verifier_path and os.path.exists(verifier_path):
+            try:
+                self.verifier = PlateVerifier.load(verifier_path)
+                print(f"[model] Loaded {verifier_path}")
+            except Exception as e:
+                print("[model] Failed loading plate verifier:", e)
 
-    def detect_yellow_white_regions(self, image):
+    def detect_yellow_white_regions(self, image, scale=1.0):
         """Detect yellow and white plate regions using color segmentation"""
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         
@@ -74,19 +105,29 @@ class ImprovedPlateDetectorOCR:
         plate_mask = cv2.bitwise_or(yellow_mask, white_mask)
         
         # Morphological operations to clean up
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+        k = scaled_kernel(5, scale)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (k, k))
         plate_mask = cv2.morphologyEx(plate_mask, cv2.MORPH_CLOSE, kernel)
         plate_mask = cv2.morphologyEx(plate_mask, cv2.MORPH_OPEN, kernel)
         
         return plate_mask
 
-    def find_plate_candidates(self, image):
-        """Find all potential plate regions using multiple methods"""
-        h, w = image.shape[:2]
+    def find_plate_candidates(self, image, scale=1.0, frame_size=None):
+        """Find all potential plate regions using multiple methods.
+
+        Size limits and kernels are tuned for native pixels; scale is the
+        factor the image was downscaled by (coarse level), and shrinks them
+        to match so the same plates pass at any resolution. frame_size is
+        the (w, h) of the whole frame at this scale when image is an ROI
+        crop, so the relative size limits do not reject a plate that fills
+        a tight band.
+        """
+        w, h = frame_size if frame_size is not None else image.shape[1::-1]
         candidates = []
+        min_w, min_h = 80 * scale, 20 * scale
         
         # Method 1: Color-based detection
-        color_mask = self.detect_yellow_white_regions(image)
+        color_mask = self.detect_yellow_white_regions(image, scale)
         contours1, _ = cv2.findContours(color_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         for contour in contours1:
@@ -94,7 +135,7 @@ class ImprovedPlateDetectorOCR:
             aspect_ratio = w_box / float(h_box) if h_box > 0 else 0
             
             if (2.0 < aspect_ratio < 6.0 and 
-                w_box > 80 and h_box > 20 and
+                w_box > min_w and h_box > min_h and
                 w_box < w * 0.9 and h_box < h * 0.4):
                 
                 candidates.append({
@@ -106,12 +147,13 @@ class ImprovedPlateDetectorOCR:
         
         # Method 2: Edge-based detection
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        k = scaled_kernel(5, scale, odd=True)
+        blurred = cv2.GaussianBlur(gray, (k, k), 0)
         edges = cv2.Canny(blurred, 30, 200)
         
         # Dilate edges to connect characters
         kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        dilated = cv2.dilate(edges, kernel, iterations=2)
+        dilated = cv2.dilate(edges, kernel, iterations=max(1, int(round(2 * scale))))
         
         contours2, _ = cv2.findContours(dilated, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         contours2 = sorted(contours2, key=cv2.contourArea, reverse=True)[:30]
@@ -124,7 +166,7 @@ class ImprovedPlateDetectorOCR:
             extent = area / bbox_area if bbox_area > 0 else 0
             
             if (2.0 < aspect_ratio < 6.0 and 
-                w_box > 80 and h_box > 20 and
+                w_box > min_w and h_box > min_h and
                 w_box < w * 0.9 and h_box < h * 0.4 and
                 extent > 0.5):
                 
@@ -136,10 +178,11 @@ class ImprovedPlateDetectorOCR:
                 })
         
         # Method 3: Morphological operations
-        tophat = cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (30, 5)))
+        tophat = cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, cv2.getStructuringElement(
+            cv2.MORPH_RECT, (scaled_kernel(30, scale), scaled_kernel(5, scale))))
         _, thresh = cv2.threshold(tophat, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (17, 3))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (scaled_kernel(17, scale), scaled_kernel(3, scale)))
         morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
         
         contours3, _ = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -149,7 +192,7 @@ class ImprovedPlateDetectorOCR:
             aspect_ratio = w_box / float(h_box) if h_box > 0 else 0
             
             if (2.0 < aspect_ratio < 6.0 and 
-                w_box > 80 and h_box > 20 and
+                w_box > min_w and h_box > min_h and
                 w_box < w * 0.9 and h_box < h * 0.4):
                 
                 candidates.append({
@@ -214,16 +257,43 @@ class ImprovedPlateDetectorOCR:
         
         return merged
 
-    def detect_plate_bbox(self, image):
-        """Main detection method combining multiple approaches"""
+    def roi_pixels(self, image, roi):
+        """Convert a fractional (x0, y0, x1, y1) ROI to clipped pixel bounds"""
         h, w = image.shape[:2]
+        x0, y0, x1, y1 = roi
+        x0 = min(max(0, int(x0 * w)), w - 1)
+        y0 = min(max(0, int(y0 * h)), h - 1)
+        x1 = min(max(x0 + 1, int(math.ceil(x1 * w))), w)
+        y1 = min(max(y0 + 1, int(math.ceil(y1 * h))), h)
+        return x0, y0, x1, y1
+
+    def run_model_batch(self, views):
+        """CustomPlateNet box outputs for a list of images in one forward pass"""
+        t = torch.stack([self.transform(cv2.resize(v, (256, 256))) for v in views]).to(self.device)
+        with torch.no_grad():
+            return self.model(t).cpu().numpy()
+
+    def detect_plate_bbox(self, image, roi=None, model_out=None):
+        """Main detection method combining multiple approaches.
+
+        roi restricts the search to a fractional (x0, y0, x1, y1) band of the
+        frame. The band is downscaled to detect_max_width for the candidate
+        search (coarse level) and the boxes are mapped back to full-resolution
+        frame coordinates, so OCR only touches native pixels inside them.
+        model_out is this image's row from run_model_batch, if already computed.
+
+        With a roi, CustomPlateNet is run on the ROI crop rather than on the
+        full frames it was trained on; leave CAMERA_ROIS empty for a camera
+        if the model's boxes degrade on crops.
+        """
+        H, W = image.shape[:2]
+        ox, oy, ex, ey = self.roi_pixels(image, roi) if roi is not None else (0, 0, W, H)
+        view = image[oy:ey, ox:ex]
+        h, w = view.shape[:2]
         
         if self.model is not None:
             # Use custom model if available
-            inp = cv2.resize(image, (256, 256))
-            t = self.transform(inp).unsqueeze(0).to(self.device)
-            with torch.no_grad():
-                out = self.model(t).cpu().numpy()[0]
+            out = model_out if model_out is not None else self.run_model_batch([view])[0]
             
             x1 = int(max(0, out[0]) * w)
             y1 = int(max(0, out[1]) * h)
@@ -231,10 +301,17 @@ class ImprovedPlateDetectorOCR:
             y2 = int(min(1, out[3]) * h)
             
             if x2 - x1 > 50 and y2 - y1 > 15:
-                return [(x1, y1, x2, y2)]
+                return [(x1 + ox, y1 + oy, x2 + ox, y2 + oy)]
+        
+        # Coarse level of the pyramid
+        scale = 1.0
+        if self.detect_max_width and w > self.detect_max_width:
+            scale = self.detect_max_width / float(w)
+            view = cv2.resize(view, (self.detect_max_width, max(1, int(round(h * scale)))),
+                              interpolation=cv2.INTER_AREA)
         
         # Find all candidates using multiple methods
-        candidates = self.find_plate_candidates(image)
+        candidates = self.find_plate_candidates(view, scale, (W * scale, H * scale))
         
         if not candidates:
             return []
@@ -245,8 +322,22 @@ class ImprovedPlateDetectorOCR:
         # Sort by confidence and return top candidates
         merged.sort(key=lambda x: x['confidence'], reverse=True)
         
-        # Return top 5 candidates for OCR testing
-        return [c['bbox'] for c in merged[:5]]
+        # Drop grilles, stickers etc. before they reach OCR
+        if self.verifier is not None:
+            keep = set(self.verifier.filter(view, [c['bbox'] for c in merged]))
+            merged = [c for c in merged if c['bbox'] in keep]
+        
+        # Map back to full-resolution frame coordinates, widened by one
+        # coarse pixel so rounding never clips a character
+        margin = int(math.ceil(1 / scale)) if scale < 1.0 else 0
+        boxes = []
+        for c in merged[:5]:  # Return top 5 candidates for OCR testing
+            x1, y1, x2, y2 = c['bbox']
+            boxes.append((max(0, int(x1 / scale) + ox - margin),
+                          max(0, int(y1 / scale) + oy - margin),
+                          min(W, int(math.ceil(x2 / scale)) + ox + margin),
+                          min(H, int(math.ceil(y2 / scale)) + oy + margin)))
+        return boxes
 
     def fix_ocr_errors(self, text, position):
         """Fix OCR errors based on character position in plate"""
@@ -254,94 +345,18 @@ class ImprovedPlateDetectorOCR:
             return text
         
         char = text.upper()
+        if len(char) != 1:
+            return char
         
-        # Position 0-1: Must be letters (state code)
-        if position in [0, 1]:
-            if char.isdigit():
-                digit_to_letter = {'0': 'O', '1': 'I', '2': 'Z', '3': 'E', 
-                                  '4': 'A', '5': 'S', '6': 'G', '8': 'B', '9': 'P'}
-                return digit_to_letter.get(char, char)
-        
-        # Position 2-3: Must be digits (district code)
-        elif position in [2, 3]:
-            if char.isalpha():
-                letter_to_digit = {'O': '0', 'Q': '0', 'D': '0', 'I': '1', 
-                                  'L': '1', 'Z': '2', 'S': '5', 'G': '6', 'B': '8'}
-                return letter_to_digit.get(char, char)
-        
-        # Position 4-5: Can be letters (vehicle series)
-        elif position in [4, 5]:
-            if char.isdigit():
-                digit_to_letter = {'0': 'O', '1': 'I', '2': 'Z', '3': 'E', 
-                                  '5': 'S', '6': 'G', '8': 'B'}
-                return digit_to_letter.get(char, char)
-        
-        # Position 6+: Must be digits (registration number)
-        else:
-            if char.isalpha():
-                letter_to_digit = {'O': '0', 'Q': '0', 'D': '0', 'I': '1', 
-                                  'L': '1', 'Z': '2', 'S': '5', 'G': '6', 'B': '8'}
-                return letter_to_digit.get(char, char)
-        
-        return char
+        table = self.normalizer.formats[0].table_at(position)
+        return char.translate(table) if table else char
 
     def clean_plate_text(self, text):
         """Clean and validate plate text"""
-        # Remove all non-alphanumeric
-        text = re.sub(r'[^A-Z0-9]', '', text.upper())
-        
-        # Remove brand names (aggressive)
-        brands = [
-            'MARUTI', 'MARUTISUZUKI', 'SUZUKI', 'HYUNDAI', 'HONDA', 'TATA', 
-            'MAHINDRA', 'FORD', 'TOYOTA', 'KIA', 'MG', 'NISSAN', 'RENAULT',
-            'VOLKSWAGEN', 'SKODA', 'FIAT', 'CHEVROLET', 'DATSUN', 'JEEP',
-            'CIAZ', 'SWIFT', 'BALENO', 'DZIRE', 'CRETA', 'VENUE', 'CITY',
-            'JAZZ', 'AMAZE', 'NEXON', 'HARRIER', 'SAFARI', 'PUNCH', 'ALTROZ',
-            'SELTOS', 'SONET', 'HECTOR', 'ASTOR', 'INNOVA', 'FORTUNER',
-            'IND', 'INDIA', 'BHARAT', 'BH', 'SERIES'
-        ]
-        
-        for brand in sorted(brands, key=len, reverse=True):
-            text = text.replace(brand, '')
-        
-        # Try to find valid plate pattern
-        patterns = [
-            r'([A-Z]{2})(\d{2})([A-Z]{1,2})(\d{4})',
-            r'([A-Z]{2})(\d{2})([A-Z]{1,2})(\d{3})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                state_code = match[0]
-                if state_code in self.valid_states:
-                    # Found valid pattern
-                    plate = ''.join(match)
-                    # Apply position-based fixes
-                    fixed = ''
-                    for i, char in enumerate(plate):
-                        fixed += self.fix_ocr_errors(char, i)
-                    return fixed
-        
-        # If no pattern found, try to construct from text
-        if len(text) >= 8:
-            # Apply position-based fixing
-            fixed = ''
-            for i, char in enumerate(text[:10]):  # Max 10 chars
-                fixed += self.fix_ocr_errors(char, i)
-            
-            # Check if fixed version matches pattern
-            for pattern in patterns:
-                match = re.match(pattern, fixed)
-                if match and match.group(1) in self.valid_states:
-                    return ''.join(match.groups())
-        
-        return ""
+        return self.normalizer.normalize(text)
 
-    def preprocess_crop_for_ocr(self, crop):
-        """Preprocess crop with multiple methods"""
-        methods = []
-        
+    def prepare_crop_gray(self, crop):
+        """Grayscale crop, upscaled to at least 50 px high"""
         gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
         
         # Resize if too small
@@ -349,33 +364,51 @@ class ImprovedPlateDetectorOCR:
         if h < 50:
             scale = 50 / h
             gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-        
-        # Method 1: Simple threshold
-        _, thresh1 = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        methods.append(thresh1)
-        
-        # Method 2: Adaptive threshold
-        adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                         cv2.THRESH_BINARY, 11, 2)
-        methods.append(adaptive)
-        
-        # Method 3: CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        _, thresh2 = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        methods.append(thresh2)
-        
-        # Method 4: Inverted
-        _, inv = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        methods.append(inv)
-        
-        # Method 5: Original grayscale
-        methods.append(gray)
-        
-        return methods
+        return gray
+
+    def preprocess_variant(self, gray, name):
+        """Build one named preprocessing variant (see PREPROCESS_VARIANTS)"""
+        if name == "otsu":
+            # Method 1: Simple threshold
+            _, out = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        elif name == "adaptive":
+            # Method 2: Adaptive threshold
+            out = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                                        cv2.THRESH_BINARY, 11, 2)
+        elif name == "clahe_otsu":
+            # Method 3: CLAHE
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            enhanced = clahe.apply(gray)
+            _, out = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        elif name == "inverted":
+            # Method 4: Inverted
+            _, out = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        elif name == "gray":
+            # Method 5: Original grayscale
+            out = gray
+        else:
+            raise ValueError(f"unknown preprocessing variant: {name}")
+        return out
+
+    def preprocess_crop_for_ocr(self, crop):
+        """Preprocess crop with multiple methods"""
+        gray = self.prepare_crop_gray(crop)
+        return [self.preprocess_variant(gray, name) for name in PREPROCESS_VARIANTS]
 
-    def ocr_plate(self, image, box):
-        """Run OCR on detected plate region"""
+    def rank_plate_hypotheses(self, texts, n=10):
+        """N-best plate readings across OCR (text, conf) results, best first"""
+        return self.normalizer.rank(texts, n)
+
+    def match_known_plate(self, texts, known_plates):
+        """Known (registered/parked) plate the reads most likely show, or "".
+
+        See PlateNormalizer.match_known: exact reads first, then hypotheses
+        within KNOWN_PLATE_MARGIN of the best one.
+        """
+        return self.normalizer.match_known(texts, known_plates, KNOWN_PLATE_MARGIN)
+
+    def crop_for_ocr(self, image, box):
+        """Padded plate crop, or None if it is too small to read"""
         x1, y1, x2, y2 = box
         
         # Add small padding
@@ -388,57 +421,100 @@ class ImprovedPlateDetectorOCR:
         crop = image[y1:y2, x1:x2]
         
         if crop.size == 0 or crop.shape[0] < 10 or crop.shape[1] < 30:
-            return ""
-        
-        # Get multiple preprocessed versions
-        preprocessed = self.preprocess_crop_for_ocr(crop)
-        
-        all_texts = []
-        
-        for prep in preprocessed:
-            try:
-                results = self.reader.readtext(
-                    prep,
-                    detail=1,
-                    paragraph=False,
-                    batch_size=1,
-                    workers=0
-                )
-                
-                for bbox, text, conf in results:
-                    if conf > 0.1:  # Very lenient threshold
-                        all_texts.append((text, conf))
-            except:
-                continue
-        
+            return None
+        return crop
+
+    def select_plate(self, all_texts, sources, known_plates=None):
+        """Pick the plate from every variant's OCR reads; returns (plate, winning variant)"""
         if not all_texts:
-            return ""
+            return "", None
+        
+        # Fragments from different variants may only add up to a known plate together
+        known = self.match_known_plate(all_texts, known_plates)
+        if known:
+            return known, None
         
         # Try cleaning each detected text
         valid_plates = []
         
-        for text, conf in all_texts:
+        for (text, conf), name in zip(all_texts, sources):
             cleaned = self.clean_plate_text(text)
             if cleaned:
-                valid_plates.append((cleaned, conf))
+                valid_plates.append((cleaned, conf, name))
         
         # Try combining texts
         if not valid_plates and len(all_texts) > 1:
             combined = ''.join([t for t, c in all_texts])
             cleaned = self.clean_plate_text(combined)
             if cleaned:
-                valid_plates.append((cleaned, 1.0))
+                valid_plates.append((cleaned, 1.0, None))
         
         if not valid_plates:
-            return ""
+            return "", None
         
         # Return highest confidence valid plate
         valid_plates.sort(key=lambda x: x[1], reverse=True)
-        return valid_plates[0][0]
+        return valid_plates[0][0], valid_plates[0][2]
+
+    def ocr_plate(self, image, box, known_plates=None, camera_id=None):
+        """Run OCR on detected plate region.
+
+        Preprocessing variants run in the order variant_selector suggests for
+        this camera and hour. With known_plates, the N-best hypotheses of each
+        variant are checked against the set and the first hit is returned
+        without OCR-ing the remaining variants. The box is taken to be the
+        plate, so a non-empty read is recorded in the variant statistics.
+        """
+        plate, tried, winner = self.read_box(image, box, known_plates, camera_id)
+        if plate:
+            self.variant_selector.record(camera_id, tried, winner)
+        return plate
+
+    def read_box(self, image, box, known_plates=None, camera_id=None):
+        """ocr_plate without recording; returns (plate, variants tried, winning variant)"""
+        crop = self.crop_for_ocr(image, box)
+        if crop is None:
+            return "", [], None
+        
+        gray = self.prepare_crop_gray(crop)
+        tried = []
+        all_texts = []
+        sources = []  # variant that produced each entry of all_texts
+        
+        for name in self.variant_selector.order(camera_id):
+            try:
+                results = self.reader.readtext(
+                    self.preprocess_variant(gray, name),
+                    detail=1,
+                    paragraph=False,
+                    batch_size=1,
+                    workers=0
+                )
+            except:
+                continue
+            tried.append(name)
+            
+            variant_texts = [(text, conf) for bbox, text, conf in results if conf > 0.1]  # Very lenient threshold
+            all_texts.extend(variant_texts)
+            sources.extend([name] * len(variant_texts))
+            
+            known = self.match_known_plate(variant_texts, known_plates)
+            if known:
+                return known, tried, name
+        
+        plate, winner = self.select_plate(all_texts, sources, known_plates)
+        return plate, tried, winner
 
-    def detect_and_ocr(self, image):
-        """Main pipeline: detect plates and run OCR"""
-        boxes = self.detect_plate_bbox(image)
+    def detect_and_ocr(self, image, known_plates=None, roi=None, camera_id=None):
+        """Main pipeline: detect plates and run OCR.
+
+        known_plates (e.g. the registered set) lets OCR resolve ambiguous
+        reads; a candidate that yields a known plate ends the search.
+        roi is the camera's plate band, see detect_plate_bbox; camera_id
+        keys the preprocessing-variant statistics, which are updated once per
+        frame, for the candidate whose plate is returned first.
+        """
+        boxes = self.detect_plate_bbox(image, roi)
         
         if not boxes:
             print("[DEBUG] No plate candidates found")
@@ -447,17 +523,27 @@ class ImprovedPlateDetectorOCR:
         print(f"[DEBUG] Found {len(boxes)} plate candidates")
         
         results = []
+        first_read = None  # (tried, winner) behind results[0]
         
         for idx, box in enumerate(boxes):
             print(f"[DEBUG] Testing candidate {idx+1}: {box}")
-            text = self.ocr_plate(image, box)
+            text, tried, winner = self.read_box(image, box, known_plates, camera_id)
             
             if text:
                 print(f"[DEBUG] Candidate {idx+1} yielded: {text}")
+                if known_plates and text in known_plates:
+                    self.variant_selector.record(camera_id, tried, winner)
+                    return [(box, text)]
                 results.append((box, text))
+                if first_read is None:
+                    first_read = (tried, winner)
             else:
                 print(f"[DEBUG] Candidate {idx+1} failed OCR")
         
+        # non-plate candidates say nothing about which variant reads plates
+        if first_read is not None:
+            self.variant_selector.record(camera_id, *first_read)
+        
         # Remove duplicates
         seen = set()
         unique_results = []
@@ -468,6 +554,134 @@ class ImprovedPlateDetectorOCR:
         
         return unique_results
 
+    def ocr_crops_batched(self, grays, ocr_size=(400, 100), batch_size=32):
+        """readtext over many grayscale crops at once; [(text, conf)] per crop.
+
+        Crops are resized to ocr_size so the text detector runs on one stacked
+        array, then every detected line of every crop is recognised in a
+        single call on a vertical strip of the crops.
+        """
+        if not grays:
+            return []
+        w, h = ocr_size
+        tiles = [cv2.resize(g, (w, h), interpolation=cv2.INTER_AREA if g.shape[1] > w else cv2.INTER_CUBIC)
+                 for g in grays]
+        stack = np.stack([cv2.cvtColor(t, cv2.COLOR_GRAY2RGB) for t in tiles])
+        horizontal, free = self.reader.detect(stack, reformat=False)
+        
+        # shift each crop's boxes to its tile of the strip, clipped so they
+        # never reach into the neighbouring crop
+        boxes_h, boxes_f = [], []
+        for i, (h_list, f_list) in enumerate(zip(horizontal, free)):
+            off = i * h
+            for x0, x1, y0, y1 in h_list:
+                y0, y1 = max(0, y0), min(h, y1)
+                if y1 > y0:
+                    boxes_h.append([x0, x1, y0 + off, y1 + off])
+            for pts in f_list:
+                boxes_f.append([[x, min(max(0, y), h) + off] for x, y in pts])
+        
+        texts = [[] for _ in grays]
+        if not boxes_h and not boxes_f:
+            return texts
+        
+        results = self.reader.recognize(np.vstack(tiles), boxes_h, boxes_f,
+                                        batch_size=batch_size, detail=1, paragraph=False)
+        for box, text, conf in results:
+            if conf > 0.1:  # same lenient threshold as ocr_plate
+                ys = [y for _, y in box]
+                i = int((min(ys) + max(ys)) / 2) // h
+                texts[min(max(i, 0), len(grays) - 1)].append((text, conf))
+        return texts
+
+    def process_batch(self, items, batch_size=8, known_plates=None, roi=None,
+                      camera_id=None, ocr_size=(400, 100)):
+        """Batched detect_and_ocr over (key, image) pairs; yields (key, results).
+
+        Images are taken batch_size at a time: CustomPlateNet runs once on the
+        stacked batch, and OCR runs in rounds, where round k reads the k-th
+        preprocessing variant of every crop still unresolved across the whole
+        batch. A crop drops out once its reads match a known plate. Results
+        are yielded per image as each batch finishes; images that are None
+        (unreadable) yield []. Results match detect_and_ocr, except that crops
+        are read at a fixed ocr_size.
+        """
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from self._process_chunk(batch, known_plates, roi, camera_id, ocr_size)
+                batch = []
+        if batch:
+            yield from self._process_chunk(batch, known_plates, roi, camera_id, ocr_size)
+
+    def _process_chunk(self, batch, known_plates, roi, camera_id, ocr_size):
+        images = [img for _, img in batch if img is not None]
+        model_outs = [None] * len(images)
+        if self.model is not None and images:
+            views = []
+            for img in images:
+                ox, oy, ex, ey = self.roi_pixels(img, roi) if roi is not None else (0, 0, img.shape[1], img.shape[0])
+                views.append(img[oy:ey, ox:ex])
+            model_outs = list(self.run_model_batch(views))
+        
+        # one entry per readable candidate crop across the batch
+        crops = []
+        outs = iter(model_outs)
+        for n, (key, img) in enumerate(batch):
+            if img is None:
+                continue
+            for box in self.detect_plate_bbox(img, roi, next(outs)):
+                crop = self.crop_for_ocr(img, box)
+                if crop is not None:
+                    crops.append({"image": n, "box": box, "gray": self.prepare_crop_gray(crop),
+                                  "order": self.variant_selector.order(camera_id),
+                                  "tried": [], "texts": [], "sources": [], "plate": None, "winner": None})
+        
+        for k in range(len(PREPROCESS_VARIANTS)):
+            pending = [c for c in crops if c["plate"] is None and k < len(c["order"])]
+            if not pending:
+                break
+            names = [c["order"][k] for c in pending]
+            try:
+                reads = self.ocr_crops_batched(
+                    [self.preprocess_variant(c["gray"], name) for c, name in zip(pending, names)], ocr_size)
+            except Exception as e:
+                print(f"[ERROR] Batched OCR failed: {e}")
+                continue
+            for c, name, texts in zip(pending, names, reads):
+                c["tried"].append(name)
+                c["texts"].extend(texts)
+                c["sources"].extend([name] * len(texts))
+                known = self.match_known_plate(texts, known_plates)
+                if known:
+                    c["plate"], c["winner"] = known, name
+        
+        for c in crops:
+            if c["plate"] is None:
+                c["plate"], c["winner"] = self.select_plate(c["texts"], c["sources"], known_plates)
+        
+        for n, (key, img) in enumerate(batch):
+            results = []
+            first = None  # crop behind results[0]; the only one recorded
+            seen = set()
+            for c in crops:
+                if c["image"] != n or not c["plate"] or c["plate"] in seen:
+                    continue
+                if known_plates and c["plate"] in known_plates:
+                    results, first = [(c["box"], c["plate"])], c
+                    break
+                seen.add(c["plate"])
+                results.append((c["box"], c["plate"]))
+                first = first or c
+            if first is not None:
+                self.variant_selector.record(camera_id, first["tried"], first["winner"])
+            yield key, results
+
+    def process_paths(self, paths, batch_size=8, workers=4, **kwargs):
+        """process_batch over image files, decoded by a prefetching reader pool"""
+        return self.process_batch(prefetch_images(paths, workers), batch_size, **kwargs)
+
     def visualize_detection(self, image, results):
         """Helper function to visualize detections"""
         img_copy = image.copy()
@@ -478,4 +692,18 @@ class ImprovedPlateDetectorOCR:
             cv2.putText(img_copy, text, (x1, y1 - 10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
         
-        return img_copy
\ No newline at end of file
+        return img_copy
+
+def prefetch_images(paths, workers=4, prefetch=16):
+    """Yield (path, image) in order, decoding up to `prefetch` files ahead on a
+    thread pool (cv2.imread releases the GIL); image is None if unreadable."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as pool:
+        window = deque()
+        for path in paths:
+            window.append((path, pool.submit(cv2.imread, path)))
+            if len(window) >= prefetch:
+                path, fut = window.popleft()
+                yield path, fut.result()
+        while window:
+            path, fut = window.popleft()
+            yield path, fut.result()
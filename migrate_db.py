@@ -18,6 +18,39 @@ def migrate_database():
             c.execute("ALTER TABLE events_log ADD COLUMN event_type TEXT DEFAULT 'entry'")
             conn.commit()
             print("✓ Migration successful! event_type column added.")
+        else:
+            print("✓ events_log already up to date.")
+        
+        # Slot map columns used for nearest-slot allocation
+        c.execute("PRAGMA table_info(parking_slots)")
+        columns = [row[1] for row in c.fetchall()]
+        added = []
+        for name, decl in [("zone", "TEXT"), ("level", "INTEGER DEFAULT 0"),
+                           ("x", "REAL DEFAULT 0"), ("y", "REAL DEFAULT 0")]:
+            if name not in columns:
+                c.execute(f"ALTER TABLE parking_slots ADD COLUMN {name} {decl}")
+                added.append(name)
+        
+        # Pre-reprocessing read, set by reprocess_events.py
+        c.execute("PRAGMA table_info(events_log)")
+        columns = [row[1] for row in c.fetchall()]
+        if 'original_plate' not in columns:
+            c.execute("ALTER TABLE events_log ADD COLUMN original_plate TEXT")
+            added.append("original_plate")
+        for name in ("lane", "camera_id"):
+            if name not in columns:
+                c.execute(f"ALTER TABLE events_log ADD COLUMN {name} TEXT")
+                added.append(name)
+        
+        c.execute("PRAGMA table_info(registered_vehicles)")
+        columns = [row[1] for row in c.fetchall()]
+        if 'preferred_zone' not in columns:
+            c.execute("ALTER TABLE registered_vehicles ADD COLUMN preferred_zone TEXT")
+            added.append("preferred_zone")
+        
+        conn.commit()
+        if added:
+            print(f"✓ Migration successful! Added columns: {', '.join(added)}")
         else:
             print("✓ Database already up to date. No migration needed.")
     
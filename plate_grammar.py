@@ -0,0 +1,276 @@
+# plate_grammar.py
+import heapq
+import math
+import re
+
+# Valid Indian state codes
+INDIAN_STATE_CODES = frozenset({
+    'AN', 'AP', 'AR', 'AS', 'BR', 'CH', 'CG', 'DD', 'DL', 'DN',
+    'GA', 'GJ', 'HP', 'HR', 'JH', 'JK', 'KA', 'KL', 'LA', 'LD',
+    'MH', 'ML', 'MN', 'MP', 'MZ', 'NL', 'OD', 'OR', 'PB', 'PY',
+    'RJ', 'SK', 'TN', 'TR', 'TS', 'UK', 'UP', 'WB'
+})
+
+# Text that OCR picks up around the plate (brands, models, IND strip)
+BRAND_TOKENS = (
+    'MARUTI', 'MARUTISUZUKI', 'SUZUKI', 'HYUNDAI', 'HONDA', 'TATA',
+    'MAHINDRA', 'FORD', 'TOYOTA', 'KIA', 'MG', 'NISSAN', 'RENAULT',
+    'VOLKSWAGEN', 'SKODA', 'FIAT', 'CHEVROLET', 'DATSUN', 'JEEP',
+    'CIAZ', 'SWIFT', 'BALENO', 'DZIRE', 'CRETA', 'VENUE', 'CITY',
+    'JAZZ', 'AMAZE', 'NEXON', 'HARRIER', 'SAFARI', 'PUNCH', 'ALTROZ',
+    'SELTOS', 'SONET', 'HECTOR', 'ASTOR', 'INNOVA', 'FORTUNER',
+    'IND', 'INDIA', 'BHARAT', 'BH', 'SERIES'
+)
+
+# Position-class fixes for common OCR confusions, as str.translate tables
+TO_LETTER = str.maketrans({'0': 'O', '1': 'I', '2': 'Z', '3': 'E',
+                           '4': 'A', '5': 'S', '6': 'G', '8': 'B', '9': 'P'})
+TO_DIGIT = str.maketrans({'O': '0', 'Q': '0', 'D': '0', 'I': '1',
+                          'L': '1', 'Z': '2', 'S': '5', 'G': '6', 'B': '8'})
+TO_SERIES = str.maketrans({'0': 'O', '1': 'I', '2': 'Z', '3': 'E',
+                           '5': 'S', '6': 'G', '8': 'B'})
+
+# P(true char | OCR read) for characters the recognizer commonly mixes up on
+# plates; the remaining mass stays on the character that was read
+CONFUSIONS = {
+    '0': {'O': 0.30, 'D': 0.10, 'Q': 0.05}, 'O': {'0': 0.30, 'D': 0.10, 'Q': 0.05},
+    'D': {'0': 0.15, 'O': 0.10}, 'Q': {'0': 0.15, 'O': 0.15},
+    '1': {'I': 0.30, 'L': 0.10, '7': 0.05}, 'I': {'1': 0.30, 'L': 0.05, 'T': 0.05},
+    'L': {'1': 0.15, 'I': 0.10}, 'T': {'7': 0.10, 'I': 0.05}, '7': {'T': 0.10, '1': 0.05},
+    '2': {'Z': 0.25}, 'Z': {'2': 0.25, '7': 0.05},
+    '5': {'S': 0.30}, 'S': {'5': 0.30},
+    '6': {'G': 0.25, 'B': 0.05}, 'G': {'6': 0.25, 'C': 0.10}, 'C': {'G': 0.10},
+    '8': {'B': 0.30, '3': 0.05}, 'B': {'8': 0.30, '3': 0.05},
+    '4': {'A': 0.15}, 'A': {'4': 0.15},
+    '3': {'E': 0.10, '8': 0.05}, 'E': {'3': 0.10, 'F': 0.05}, 'F': {'E': 0.05},
+    '9': {'P': 0.05}, 'P': {'9': 0.05},
+    'H': {'M': 0.05, 'N': 0.05}, 'M': {'H': 0.05, 'N': 0.05}, 'N': {'H': 0.05, 'M': 0.05},
+    'U': {'V': 0.10}, 'V': {'U': 0.10},
+}
+
+# log-penalty per read character left outside the plate window
+DROP_COST = math.log(0.3)
+
+# a known plate may score at most this much (log probability) below the best
+# hypothesis: one common swap (0/O, 1/I, 8/B, 4/A) fits, rarer ones do not
+KNOWN_PLATE_MARGIN = 2.0
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]')
+_CLASS_OK = {'L': str.isalpha, 'D': str.isdigit}
+_options_cache = {}
+
+def char_options(char, cls):
+    """[(candidate, log p)] for one read character under a position class"""
+    key = (char, cls)
+    if key not in _options_cache:
+        alts = CONFUSIONS.get(char, {})
+        ok = _CLASS_OK[cls]
+        opts = [(c, math.log(p)) for c, p in alts.items() if ok(c)]
+        if ok(char):
+            opts.append((char, math.log(1.0 - sum(alts.values()))))
+        opts.sort(key=lambda o: o[1], reverse=True)
+        _options_cache[key] = opts
+    return _options_cache[key]
+
+def beam_decode(window, layout, beam_width):
+    """Top-scoring (log p, string) pairs for a window under a layout like LLDDLDDDD"""
+    beam = [(0.0, '')]
+    for char, cls in zip(window, layout):
+        opts = char_options(char, cls)
+        if not opts:
+            return []
+        beam = heapq.nlargest(beam_width, ((score + lp, prefix + c)
+                                           for score, prefix in beam for c, lp in opts))
+    return beam
+
+class PlateFormat:
+    """A plate layout the normalizer can recognise.
+
+    patterns are tried in order; each must capture the plate as groups.
+    segments map position ranges to translate tables, e.g.
+    [(0, 2, TO_LETTER), (2, None, TO_DIGIT)]. Subclasses override
+    is_valid() for checks a regex can't express (state codes etc).
+    """
+    name = "generic"
+    keep_tokens = ()    # tokens that must not be stripped as brand text
+    layouts = ()        # position classes per plate length, for hypotheses()
+    min_len = 8         # shortest raw text worth a position-fixed retry
+    max_len = 10
+
+    def __init__(self, patterns, segments):
+        self.patterns = [re.compile(p) for p in patterns]
+        self.segments = segments
+
+    def is_valid(self, groups):
+        return True
+
+    def accepts(self, plate):
+        for pattern in self.patterns:
+            match = pattern.fullmatch(plate)
+            if match and self.is_valid(match.groups()):
+                return True
+        return False
+
+    def fix(self, text):
+        return ''.join(text[start:end].translate(table) for start, end, table in self.segments)
+
+    def table_at(self, position):
+        for start, end, table in self.segments:
+            if position >= start and (end is None or position < end):
+                return table
+        return None
+
+    def search(self, text):
+        """Find a valid plate anywhere in already-stripped text"""
+        for pattern in self.patterns:
+            for match in pattern.finditer(text):
+                groups = match.groups()
+                if self.is_valid(groups):
+                    return self.fix(''.join(groups))
+        return ""
+
+    def repair(self, text):
+        """Fix characters by position first, then require a match at the start"""
+        if len(text) < self.min_len:
+            return ""
+        fixed = self.fix(text[:self.max_len])
+        for pattern in self.patterns:
+            match = pattern.match(fixed)
+            if match and self.is_valid(match.groups()):
+                return ''.join(match.groups())
+        return ""
+
+class StandardIndianFormat(PlateFormat):
+    """SS DD XX NNNN, e.g. TN88F4089"""
+    name = "standard"
+    layouts = ("LLDDLDDDD", "LLDDLLDDDD", "LLDDLDDD", "LLDDLLDDD")
+
+    def __init__(self, state_codes=INDIAN_STATE_CODES):
+        super().__init__(
+            [r'([A-Z]{2})(\d{2})([A-Z]{1,2})(\d{4})',
+             r'([A-Z]{2})(\d{2})([A-Z]{1,2})(\d{3})'],
+            [(0, 2, TO_LETTER), (2, 4, TO_DIGIT), (4, 6, TO_SERIES), (6, None, TO_DIGIT)],
+        )
+        self.state_codes = state_codes
+
+    def is_valid(self, groups):
+        return groups[0] in self.state_codes
+
+class BharatSeriesFormat(PlateFormat):
+    """YY BH NNNN XX, e.g. 22BH1234AA (not enabled by default)"""
+    name = "bh"
+    keep_tokens = ('BH',)
+    layouts = ("DDLLDDDDL", "DDLLDDDDLL")
+    min_len = 9
+
+    def __init__(self):
+        super().__init__(
+            [r'(\d{2})(BH)(\d{4})([A-Z]{1,2})'],
+            [(0, 2, TO_DIGIT), (2, 4, TO_LETTER), (4, 8, TO_DIGIT), (8, None, TO_LETTER)],
+        )
+
+class PlateNormalizer:
+    """Precompiled replacement for the old replace/regex loop in clean_plate_text.
+
+    Brand stripping keeps the original semantics (each token removed in turn,
+    longest first) but a single compiled alternation is checked first, so the
+    usual case of a string without any brand text costs one regex scan.
+    """
+
+    def __init__(self, formats=None, strip_tokens=BRAND_TOKENS):
+        self.formats = []
+        self.strip_tokens = tuple(strip_tokens)
+        for fmt in formats if formats is not None else [StandardIndianFormat()]:
+            self.register_format(fmt)
+
+    def register_format(self, fmt):
+        self.formats.append(fmt)
+        self._compile_strip()
+
+    def _compile_strip(self):
+        keep = {tok for fmt in self.formats for tok in fmt.keep_tokens}
+        tokens = [t for t in self.strip_tokens if t not in keep]
+        self._strip_order = sorted(tokens, key=len, reverse=True)
+        self._strip_re = re.compile('|'.join(map(re.escape, self._strip_order))) if tokens else None
+
+    def strip(self, text):
+        if self._strip_re is None or not self._strip_re.search(text):
+            return text
+        for token in self._strip_order:
+            if token in text:
+                text = text.replace(token, '')
+        return text
+
+    def normalize(self, text):
+        """Return the cleaned plate, or "" if no registered format matches"""
+        text = self.strip(_NON_ALNUM.sub('', text.upper()))
+        for fmt in self.formats:
+            plate = fmt.search(text)
+            if plate:
+                return plate
+        for fmt in self.formats:
+            plate = fmt.repair(text)
+            if plate:
+                return plate
+        return ""
+
+    def hypotheses(self, text, confidence=1.0, n=5, beam_width=8):
+        """N-best plate readings for one OCR string, as [(plate, score)].
+
+        Every window of the stripped text that fits a format layout is
+        decoded with a beam search over CONFUSIONS. The score is the summed
+        log probability, DROP_COST for every character left outside the
+        window, and the log of the OCR confidence, so hypotheses from several
+        reads can be ranked together.
+        """
+        text = self.strip(_NON_ALNUM.sub('', text.upper()))
+        base = math.log(max(confidence, 1e-3))
+        best = {}
+        for fmt in self.formats:
+            for layout in fmt.layouts:
+                dropped = (len(text) - len(layout)) * DROP_COST
+                for start in range(len(text) - len(layout) + 1):
+                    window = text[start:start + len(layout)]
+                    for score, plate in beam_decode(window, layout, beam_width):
+                        score += base + dropped
+                        if score > best.get(plate, -math.inf) and fmt.accepts(plate):
+                            best[plate] = score
+        return heapq.nlargest(n, best.items(), key=lambda item: item[1])
+
+    def rank(self, texts, n=10):
+        """N-best plate readings across OCR (text, conf) results, best first"""
+        scores = {}
+        reads = list(texts)
+        if len(reads) > 1:
+            combined = ''.join([t for t, c in reads])
+            reads.append((combined, min(c for t, c in reads)))
+        for text, conf in reads:
+            for plate, score in self.hypotheses(text, conf, n=n):
+                if score > scores.get(plate, -math.inf):
+                    scores[plate] = score
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:n]
+
+    def match_known(self, texts, known_plates, margin=KNOWN_PLATE_MARGIN):
+        """Known plate the (text, conf) reads most likely show, or "".
+
+        A read that cleans to a known plate is taken as is. Otherwise a known
+        plate matches when its hypothesis scores within `margin` of the best
+        one, so a clean read is not swapped for a look-alike known plate.
+        """
+        if not known_plates or not texts:
+            return ""
+        for text, conf in sorted(texts, key=lambda t: t[1], reverse=True):
+            plate = self.normalize(text)
+            if plate and plate in known_plates:
+                return plate
+        ranked = self.rank(texts)
+        if not ranked:
+            return ""
+        best = ranked[0][1]
+        for plate, score in ranked:
+            if best - score > margin:
+                break
+            if plate in known_plates:
+                return plate
+        return ""
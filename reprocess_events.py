@@ -0,0 +1,135 @@
+# reprocess_events.py
+# Re-run plate recognition over stored gate images and write corrected reads
+# back to events_log, e.g. after changing the plate grammar or the model.
+#
+#   python reprocess_events.py --since-id 1200 --dry-run
+#   python reprocess_events.py --event-type entry --roi entry=0.2,0.45,0.8,0.95
+#
+# Images are decoded ahead by a reader pool and recognised with
+# ImprovedPlateDetectorOCR.process_batch. Rows whose read changes get the new
+# plate; the first read is kept in original_plate. Updates are written with
+# executemany in one transaction per --commit-every rows.
+#
+# image_path points at the evidence frame, which EvidenceStore downscales to
+# 1280 px wide, so reads can be weaker than the live ones on native frames.
+# Events are grouped by lane/camera and read with the same ROI (pass the
+# server's CAMERA_ROIS with --roi) and camera statistics as live. Entry reads
+# are matched against the registered plates; exit reads are not matched
+# against anything, since the parked set at the time is not known.
+import argparse
+import os
+import sqlite3
+import time
+
+DB_PATH = "parking_system.db"
+
+def load_events(db_path, since_id=0, limit=None, event_type=None):
+    """[(id, plate, image_path, event_type, lane, camera_id)] for events that still have an image on disk"""
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    query = ("SELECT id, plate, image_path, event_type, lane, camera_id FROM events_log "
+             "WHERE id > ? AND image_path IS NOT NULL")
+    params = [since_id]
+    if event_type:
+        query += " AND event_type = ?"
+        params.append(event_type)
+    query += " ORDER BY id"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    c.execute(query, params)
+    rows = c.fetchall()
+    conn.close()
+    return [r for r in rows if os.path.exists(r[2])]
+
+def registered_plates(db_path):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT plate FROM registered_vehicles")
+    plates = {r[0] for r in c.fetchall()}
+    conn.close()
+    return plates
+
+def parse_roi(value):
+    """KEY=x0,y0,x1,y1 -> (KEY, (x0, y0, x1, y1))"""
+    key, _, coords = value.partition("=")
+    roi = tuple(float(v) for v in coords.split(","))
+    if not key or len(roi) != 4:
+        raise argparse.ArgumentTypeError(f"expected KEY=x0,y0,x1,y1, got {value!r}")
+    return key, roi
+
+def write_updates(db_path, updates):
+    """Apply [(new_plate, event_id)] in a single transaction"""
+    if not updates:
+        return
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "UPDATE events_log SET original_plate = COALESCE(original_plate, plate), plate = ? WHERE id = ?",
+            updates)
+    conn.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Re-read stored gate images into events_log. Reads the downscaled "
+                    "(1280 px) evidence frames, not the original camera frames.")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--since-id", type=int, default=0, help="only events with a larger id")
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--event-type", choices=["entry", "exit"], default=None)
+    ap.add_argument("--batch-size", type=int, default=8, help="images per model/OCR batch")
+    ap.add_argument("--workers", type=int, default=4, help="image decoding threads")
+    ap.add_argument("--commit-every", type=int, default=500)
+    ap.add_argument("--detect-max-width", type=int, default=1280, help="match server DETECT_MAX_WIDTH")
+    ap.add_argument("--roi", type=parse_roi, action="append", default=[],
+                    help="camera_id or lane=x0,y0,x1,y1, as in server CAMERA_ROIS (repeatable)")
+    ap.add_argument("--dry-run", action="store_true", help="print changes without writing them")
+    args = ap.parse_args()
+
+    events = load_events(args.db, args.since_id, args.limit, args.event_type)
+    print(f"{len(events)} events with images to reprocess")
+    if not events:
+        raise SystemExit(0)
+
+    from improved_model import ImprovedPlateDetectorOCR
+    detector = ImprovedPlateDetectorOCR(detect_max_width=args.detect_max_width)
+    rois = dict(args.roi)
+    registered = registered_plates(args.db)
+
+    # one pass per (event type, lane, camera) so each gets its own ROI and
+    # known plates; the same image can back several events (retries)
+    groups = {}
+    for event_id, plate, path, event_type, lane, camera_id in events:
+        by_path = groups.setdefault((event_type, lane, camera_id), {})
+        by_path.setdefault(path, []).append((event_id, plate))
+
+    updates = []
+    changed = unreadable = done = 0
+    start = time.perf_counter()
+    for (event_type, lane, camera_id), by_path in groups.items():
+        camera = camera_id or lane
+        for path, results in detector.process_paths(
+                list(by_path), args.batch_size, args.workers,
+                known_plates=registered if event_type == "entry" else None,
+                roi=rois.get(camera), camera_id=camera):
+            new_plate = results[0][1] if results else None
+            for event_id, old_plate in by_path[path]:
+                done += 1
+                if new_plate is None:
+                    unreadable += 1
+                    continue
+                if new_plate == old_plate:
+                    continue
+                changed += 1
+                print(f"  #{event_id}: {old_plate} -> {new_plate}")
+                updates.append((new_plate, event_id))
+            if not args.dry_run and len(updates) >= args.commit_every:
+                write_updates(args.db, updates)
+                updates = []
+    if not args.dry_run:
+        write_updates(args.db, updates)
+
+    elapsed = time.perf_counter() - start
+    print(f"{done} events in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f}/s): "
+          f"{changed} changed, {unreadable} without a plate read"
+          + (" (dry run, nothing written)" if args.dry_run else ""))
@@ -1,13 +1,19 @@
 # server.py
 import os
 import sqlite3
+import threading
 import time
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 import uvicorn
 import cv2
 from improved_model import ImprovedPlateDetectorOCR
+from slot_allocator import SlotMap
+from frame_ingest import SharedFrameRing, decode_jpeg, multipart_field
+from evidence_store import EvidenceStore
+from gate_debounce import GateDebouncer
 
 # config
 IMAGE_DIR = "preloaded_images"   # put test images here
@@ -15,7 +21,40 @@ WEBCAM_INDEX = 0                 # set to your webcam index
 WIFICAM_URL = None               # or "rtsp://..." or "http://ip:port/stream"
 DB_PATH = "parking_system.db"
 
-detector = ImprovedPlateDetectorOCR(model_path="custom_plate_model.pth")
+# gate lanes and where they sit on the site map (same units as slot x/y)
+LANES = {
+    "entry": {"x": 0.0, "y": 0.0, "level": 0},
+}
+DEFAULT_LANE = "entry"
+
+# per-camera band where plates appear, as (x0, y0, x1, y1) fractions of the frame;
+# keyed by camera_id, or by lane when the request has no camera_id
+CAMERA_ROIS = {
+    # "entry": (0.2, 0.45, 0.8, 0.95),
+}
+# shared-memory rings (frame_ingest.SharedFrameRing) that capture processes on
+# this machine create; "shm" requests may only name one of these
+SHM_RINGS = (
+    # "gate1_frames",
+)
+
+# candidate search runs on a copy of the ROI at most this wide; its size limits
+# and kernels shrink with the downscale, so plates pass as at native resolution
+DETECT_MAX_WIDTH = 1280
+
+# audit images (plate crop + downscaled frame) per event, written off the request path
+EVIDENCE_DIR = "evidence"
+EVIDENCE_MAX_BYTES = 2 * 1024 ** 3
+EVIDENCE_MAX_AGE_DAYS = 30
+
+# triggers during a lane's read share its result; later re-triggers that read
+# the same plate within this many seconds reuse it instead of allocating/logging again
+GATE_DEBOUNCE_SECONDS = 6.0
+
+detector = ImprovedPlateDetectorOCR(model_path="custom_plate_model.pth", detect_max_width=DETECT_MAX_WIDTH)
+evidence = EvidenceStore(EVIDENCE_DIR, max_bytes=EVIDENCE_MAX_BYTES, max_age_days=EVIDENCE_MAX_AGE_DAYS)
+gate_debouncer = GateDebouncer(GATE_DEBOUNCE_SECONDS)
+allocation_lock = threading.Lock()
 app = FastAPI()
 
 # DB helpers
@@ -25,12 +64,17 @@ def init_db():
     c.execute("""CREATE TABLE IF NOT EXISTS registered_vehicles(
         id INTEGER PRIMARY KEY,
         plate TEXT UNIQUE,
-        owner TEXT
+        owner TEXT,
+        preferred_zone TEXT
     )""")
     c.execute("""CREATE TABLE IF NOT EXISTS parking_slots(
         id INTEGER PRIMARY KEY,
         slot_label TEXT UNIQUE,
-        occupied INTEGER DEFAULT 0
+        occupied INTEGER DEFAULT 0,
+        zone TEXT,
+        level INTEGER DEFAULT 0,
+        x REAL DEFAULT 0,
+        y REAL DEFAULT 0
     )""")
     c.execute("""CREATE TABLE IF NOT EXISTS active_parking(
         id INTEGER PRIMARY KEY,
@@ -50,27 +94,58 @@ def init_db():
     columns = [row[1] for row in c.fetchall()]
     if 'event_type' not in columns:
         c.execute("ALTER TABLE events_log ADD COLUMN event_type TEXT DEFAULT 'entry'")
+    # Read before reprocess_events.py rewrote plate (NULL = never reprocessed)
+    if 'original_plate' not in columns:
+        c.execute("ALTER TABLE events_log ADD COLUMN original_plate TEXT")
+    # gate and camera, so reprocessing can use the same ROI
+    for name in ("lane", "camera_id"):
+        if name not in columns:
+            c.execute(f"ALTER TABLE events_log ADD COLUMN {name} TEXT")
+    # Add slot map columns if they don't exist
+    c.execute("PRAGMA table_info(parking_slots)")
+    columns = [row[1] for row in c.fetchall()]
+    for name, decl in [("zone", "TEXT"), ("level", "INTEGER DEFAULT 0"),
+                       ("x", "REAL DEFAULT 0"), ("y", "REAL DEFAULT 0")]:
+        if name not in columns:
+            c.execute(f"ALTER TABLE parking_slots ADD COLUMN {name} {decl}")
+    c.execute("PRAGMA table_info(registered_vehicles)")
+    columns = [row[1] for row in c.fetchall()]
+    if 'preferred_zone' not in columns:
+        c.execute("ALTER TABLE registered_vehicles ADD COLUMN preferred_zone TEXT")
     # create slots example if empty
     c.execute("SELECT COUNT(*) FROM parking_slots")
     if c.fetchone()[0] == 0:
-        slots = [("A1",0),("A2",0),("A3",0),("B1",0)]
-        c.executemany("INSERT INTO parking_slots(slot_label,occupied) VALUES (?,?)", slots)
+        slots = [("A1",0,"A",0,1,0),("A2",0,"A",0,2,0),("A3",0,"A",0,3,0),("B1",0,"B",0,1,5)]
+        c.executemany("INSERT INTO parking_slots(slot_label,occupied,zone,level,x,y) VALUES (?,?,?,?,?,?)", slots)
     conn.commit()
     conn.close()
 
 init_db()
 
+slot_map = SlotMap(LANES)
+_conn = sqlite3.connect(DB_PATH)
+slot_map.load_from_db(_conn)
+_conn.close()
+
 # Pydantic models
 class EntryRequest(BaseModel):
     capture_mode: Optional[str] = "preloaded"  # default to preloaded
     image_name: Optional[str] = None          # required for preloaded
     camera_index: Optional[int] = WEBCAM_INDEX
     cam_url: Optional[str] = WIFICAM_URL
+    lane: Optional[str] = DEFAULT_LANE
+    camera_id: Optional[str] = None
+    shm_name: Optional[str] = None            # required for shm
+    frame_seq: Optional[int] = None           # shm frame, default latest
 
 class SlotUpdate(BaseModel):
     slot_label: str
     occupied: int   # 0 or 1
 
+# shared-memory rings opened by name, kept attached between requests
+shm_rings = {}
+shm_lock = threading.Lock()
+
 # utility functions
 def capture_image(req: EntryRequest):
     if req.capture_mode == "preloaded":
@@ -103,6 +178,27 @@ def capture_image(req: EntryRequest):
         if not ret:
             raise RuntimeError("wificam capture failed")
         return frame, None
+    elif req.capture_mode == "shm":
+        if not req.shm_name:
+            raise ValueError("shm_name required for shm mode")
+        if req.shm_name not in SHM_RINGS:
+            raise ValueError(f"unknown shm ring: {req.shm_name}")
+        with shm_lock:
+            if req.shm_name not in shm_rings:
+                shm_rings[req.shm_name] = SharedFrameRing(req.shm_name)
+            ring = shm_rings[req.shm_name]
+        seq = ring.latest() if req.frame_seq is None else req.frame_seq
+        # own copy: OCR takes far longer than the producer needs to lap the ring
+        frame = ring.read(seq)
+        if frame.ndim == 2:
+            img = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        elif frame.shape[2] == 3:
+            img = frame.copy()
+        else:
+            raise ValueError(f"shm frame has {frame.shape[2]} channels, expected BGR or gray")
+        if not ring.is_current(seq):
+            raise LookupError(f"frame {seq} was overwritten while reading")
+        return img, None
     else:
         raise ValueError("invalid capture_mode")
 
@@ -114,45 +210,87 @@ def query_registered(plate):
     conn.close()
     return res is not None
 
-def allocate_slot(plate):
+def camera_roi(req: EntryRequest):
+    return CAMERA_ROIS.get(req.camera_id or req.lane)
+
+def roi_view(img, roi):
+    if roi is None:
+        return img
+    x0, y0, x1, y1 = detector.roi_pixels(img, roi)
+    return img[y0:y1, x0:x1]
+
+def registered_plates():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    # pick first free slot
-    c.execute("SELECT slot_label FROM parking_slots WHERE occupied=0 LIMIT 1")
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        return None
-    slot = row[0]
-    # mark occupied
-    c.execute("UPDATE parking_slots SET occupied=1 WHERE slot_label=?", (slot,))
-    c.execute("INSERT INTO active_parking(plate, slot_label, entry_time) VALUES (?,?,?)", (plate,slot,time.ctime()))
-    conn.commit()
+    c.execute("SELECT plate FROM registered_vehicles")
+    plates = {r[0] for r in c.fetchall()}
     conn.close()
-    return slot
+    return plates
 
-def log_event(plate, authorized, image_path=None, event_type='entry'):
+def parked_plates():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("INSERT INTO events_log(timestamp,plate,authorized,image_path,event_type) VALUES (?,?,?,?,?)", 
-              (time.ctime(), plate, int(bool(authorized)), image_path, event_type))
-    conn.commit()
+    c.execute("SELECT plate FROM active_parking")
+    plates = {r[0] for r in c.fetchall()}
     conn.close()
+    return plates
 
-@app.post("/api/entry_request")
-def entry_request(req: EntryRequest):
-    """
-    Called by ESP32 when PIR at gate detects vehicle.
-    Body example:
-      { "capture_mode": "preloaded", "image_name": "test1.jpg" }
-    """
-    try:
-        img, path = capture_image(req)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+def query_preferred_zone(plate):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute("SELECT preferred_zone FROM registered_vehicles WHERE plate=?", (plate,))
+    res = c.fetchone()
+    conn.close()
+    return res[0] if res else None
+
+def allocate_slot(plate, lane=DEFAULT_LANE, preferred_zone=None):
+    with allocation_lock:
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        try:
+            # already parked (re-trigger, second lane): hand back the same slot
+            c.execute("SELECT slot_label FROM active_parking WHERE plate=?", (plate,))
+            row = c.fetchone()
+            if row:
+                return row[0]
+            for attempt in range(2):
+                # pick nearest free slot to the lane (or in the owner's zone)
+                slot = slot_map.allocate(lane, preferred_zone)
+                if not slot:
+                    return None
+                try:
+                    # mark occupied, unless the DB was changed behind the map's back
+                    c.execute("UPDATE parking_slots SET occupied=1 WHERE slot_label=? AND occupied=0", (slot,))
+                    if c.rowcount == 1:
+                        c.execute("INSERT INTO active_parking(plate, slot_label, entry_time) VALUES (?,?,?)", (plate,slot,time.ctime()))
+                        conn.commit()
+                        return slot
+                except Exception:
+                    conn.rollback()
+                    slot_map.set_occupied(slot, False)
+                    raise
+                # slot already taken in the DB (reset.py, manual SQL): the map is stale, rebuild it
+                slot_map.load_from_db(conn)
+            return None
+        finally:
+            conn.close()
+
+def save_evidence(req: EntryRequest, img, results, plate, event_type):
+    box = results[0][0] if results else None
+    return evidence.save(img, box, event_type, plate or None)
 
-    # run improved detector+ocr
-    results = detector.detect_and_ocr(img)  # list of (box, text)
+def log_event(plate, authorized, image_path=None, event_type='entry', req: EntryRequest = None):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    lane, camera_id = (req.lane, req.camera_id) if req else (None, None)
+    c.execute("INSERT INTO events_log(timestamp,plate,authorized,image_path,event_type,lane,camera_id) VALUES (?,?,?,?,?,?,?)", 
+              (time.ctime(), plate, int(bool(authorized)), image_path, event_type, lane, camera_id))
+    conn.commit()
+    conn.close()
+
+def read_plate(req: EntryRequest, img, known):
+    """Detector + OCR with the full-frame fallback; returns (best_plate, results)"""
+    results = detector.detect_and_ocr(img, known, camera_roi(req), req.camera_id or req.lane)  # list of (box, text)
     
     # Get best plate from results (already cleaned by improved model)
     best_plate = ""
@@ -163,17 +301,45 @@ def entry_request(req: EntryRequest):
     # Fallback: if nothing detected, try full-image OCR with cleaning
     if not best_plate:
         try:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = cv2.cvtColor(roi_view(img, camera_roi(req)), cv2.COLOR_BGR2GRAY)
             full = detector.reader.readtext(gray)
             if full:
-                # Combine all text and clean it
-                combined_text = "".join([r[1] for r in full])
-                best_plate = detector.clean_plate_text(combined_text)
+                best_plate = detector.match_known_plate([(r[1], r[2]) for r in full], known)
+                if not best_plate:
+                    # Combine all text and clean it
+                    combined_text = "".join([r[1] for r in full])
+                    best_plate = detector.clean_plate_text(combined_text)
         except Exception as e:
             print(f"[ERROR] Fallback OCR failed: {e}")
 
+    return best_plate, results
+
+@app.post("/api/entry_request")
+def entry_request(req: EntryRequest):
+    """
+    Called by ESP32 when PIR at gate detects vehicle.
+    Body example:
+      { "capture_mode": "preloaded", "image_name": "test1.jpg" }
+    """
+    if req.lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"unknown lane: {req.lane}")
+    try:
+        img, path = capture_image(req)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return process_entry(req, img, path)
+
+def process_entry(req: EntryRequest, img, path):
+    # registered plates let OCR resolve ambiguous reads
+    read = lambda: read_plate(req, img, registered_plates())
+    return gate_debouncer.run(("entry", req.lane), read,
+                              lambda best_plate, results: decide_entry(req, img, path, best_plate, results))
+
+def decide_entry(req: EntryRequest, img, path, best_plate, results):
+    path = save_evidence(req, img, results, best_plate, 'entry') or path
+
     if not best_plate:
-        log_event(None, False, path, 'entry')
+        log_event(None, False, path, 'entry', req)
         return {"authorized": False, "reason": "plate_not_found", "plate": None}
 
     print(f"[ENTRY] Detected plate: {best_plate}")
@@ -181,14 +347,14 @@ def entry_request(req: EntryRequest):
     # check db
     is_registered = query_registered(best_plate)
     if is_registered:
-        slot = allocate_slot(best_plate)
+        slot = allocate_slot(best_plate, req.lane, query_preferred_zone(best_plate))
         if not slot:
-            log_event(best_plate, False, path, 'entry')
+            log_event(best_plate, False, path, 'entry', req)
             return {"authorized": False, "plate": best_plate, "reason": "no_slots_available"}
-        log_event(best_plate, True, path, 'entry')
+        log_event(best_plate, True, path, 'entry', req)
         return {"authorized": True, "plate": best_plate, "slot": slot}
     else:
-        log_event(best_plate, False, path, 'entry')
+        log_event(best_plate, False, path, 'entry', req)
         return {"authorized": False, "plate": best_plate, "reason": "not_registered"}
 
 @app.post("/api/exit_request")
@@ -197,32 +363,25 @@ def exit_request(req: EntryRequest):
     Called by ESP32 when PIR at exit gate detects vehicle.
     Captures image, detects plate, finds matching active parking, and frees slot.
     """
+    if req.lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"unknown lane: {req.lane}")
     try:
         img, path = capture_image(req)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return process_exit(req, img, path)
 
-    # run improved detector+ocr
-    results = detector.detect_and_ocr(img)
-    
-    # Get best plate from results
-    best_plate = ""
-    if results:
-        best_plate = results[0][1]
-    
-    # Fallback: if nothing detected, try full-image OCR with cleaning
-    if not best_plate:
-        try:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            full = detector.reader.readtext(gray)
-            if full:
-                combined_text = "".join([r[1] for r in full])
-                best_plate = detector.clean_plate_text(combined_text)
-        except Exception as e:
-            print(f"[ERROR] Fallback OCR failed: {e}")
+def process_exit(req: EntryRequest, img, path):
+    # only parked plates can be exiting
+    read = lambda: read_plate(req, img, parked_plates())
+    return gate_debouncer.run(("exit", req.lane), read,
+                              lambda best_plate, results: decide_exit(req, img, path, best_plate, results))
+
+def decide_exit(req: EntryRequest, img, path, best_plate, results):
+    path = save_evidence(req, img, results, best_plate, 'exit') or path
 
     if not best_plate:
-        log_event(None, False, path, 'exit')
+        log_event(None, False, path, 'exit', req)
         return {"success": False, "reason": "plate_not_found", "plate": None}
 
     print(f"[EXIT] Detected plate: {best_plate}")
@@ -235,7 +394,7 @@ def exit_request(req: EntryRequest):
     
     if not row:
         conn.close()
-        log_event(best_plate, False, path, 'exit')
+        log_event(best_plate, False, path, 'exit', req)
         return {"success": False, "reason": "no_active_parking", "plate": best_plate}
     
     slot = row[0]
@@ -246,11 +405,55 @@ def exit_request(req: EntryRequest):
     
     conn.commit()
     conn.close()
+    slot_map.set_occupied(slot, False)
+    # the car's entry cycle is over; a quick re-entry is a new decision
+    gate_debouncer.forget_plate(best_plate, "entry")
     
-    log_event(best_plate, True, path, 'exit')
+    log_event(best_plate, True, path, 'exit', req)
     
     return {"success": True, "plate": best_plate, "slot": slot}
 
+def decode_frame(body, content_type):
+    """Decode the JPEG in a raw image/* body or the "image" multipart field"""
+    try:
+        if content_type.startswith("multipart/"):
+            return decode_jpeg(multipart_field(body, content_type))
+        return decode_jpeg(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/entry_frame")
+async def entry_frame(request: Request, lane: str = DEFAULT_LANE, camera_id: Optional[str] = None):
+    """
+    Entry request with the frame in the body, for edge devices that capture
+    it themselves (ESP32-CAM, capture box).
+    Example: curl -X POST --data-binary @car.jpg -H "Content-Type: image/jpeg" \
+                  "http://server:8000/api/entry_frame?lane=entry"
+    """
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"unknown lane: {lane}")
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    req = EntryRequest(capture_mode="upload", lane=lane, camera_id=camera_id)
+    def run():
+        # decoding is CPU-bound; keep it off the event loop
+        img = decode_frame(body, content_type)
+        return process_entry(req, img, None)
+    return await run_in_threadpool(run)
+
+@app.post("/api/exit_frame")
+async def exit_frame(request: Request, lane: str = DEFAULT_LANE, camera_id: Optional[str] = None):
+    """Exit request with the frame in the body, see entry_frame"""
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"unknown lane: {lane}")
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    req = EntryRequest(capture_mode="upload", lane=lane, camera_id=camera_id)
+    def run():
+        img = decode_frame(body, content_type)
+        return process_exit(req, img, None)
+    return await run_in_threadpool(run)
+
 @app.post("/api/slot_update")
 def slot_update(s: SlotUpdate):
     """
@@ -273,9 +476,11 @@ def slot_update(s: SlotUpdate):
             # Log exit event
             c.execute("INSERT INTO events_log(timestamp,plate,authorized,image_path,event_type) VALUES (?,?,?,?,?)",
                      (time.ctime(), plate, 1, None, 'exit'))
+            gate_debouncer.forget_plate(plate, "entry")
     
     conn.commit()
     conn.close()
+    slot_map.set_occupied(s.slot_label, s.occupied)
     return {"status": "ok"}
 
 @app.get("/api/slots")
@@ -283,10 +488,10 @@ def get_slots():
     """Get all parking slots status"""
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("SELECT slot_label, occupied FROM parking_slots")
+    c.execute("SELECT slot_label, occupied, zone, level FROM parking_slots")
     rows = c.fetchall()
     conn.close()
-    return {"slots": [{"slot_label": r[0], "occupied": r[1]} for r in rows]}
+    return {"slots": [{"slot_label": r[0], "occupied": r[1], "zone": r[2], "level": r[3]} for r in rows]}
 
 @app.get("/api/active_parking")
 def get_active_parking():
@@ -308,5 +513,15 @@ def get_events(limit: int = 50):
     conn.close()
     return {"events": [{"timestamp": r[0], "plate": r[1], "authorized": bool(r[2]), "event_type": r[3]} for r in rows]}
 
+@app.get("/api/variant_stats")
+def get_variant_stats():
+    """OCR preprocessing variant win-rates per camera and time of day"""
+    return {"variants": detector.variant_selector.snapshot()}
+
+@app.get("/api/evidence")
+def get_evidence_stats():
+    """Evidence store usage: file count, bytes on disk, queued and dropped writes"""
+    return evidence.stats()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
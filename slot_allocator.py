@@ -0,0 +1,119 @@
+# slot_allocator.py
+import heapq
+import math
+import threading
+
+# distance penalty for every level a driver has to climb/descend
+LEVEL_COST = 50.0
+
+class SlotMap:
+    """In-memory spatial index of parking slots.
+
+    Each lane keeps a min-heap of free slots ordered by distance from the lane,
+    plus one heap per (lane, zone) for owners with a preferred zone. Slots that
+    become occupied are dropped lazily when they reach the top of a heap, so
+    allocation and release stay O(log n) even with thousands of slots.
+    """
+
+    def __init__(self, lanes, level_cost=LEVEL_COST):
+        # lanes: {"entry": {"x": 0, "y": 0, "level": 0}, ...}
+        self.lanes = dict(lanes)
+        self.level_cost = level_cost
+        self.lock = threading.Lock()
+        self.slots = {}      # label -> {"zone", "level", "x", "y", "order"}
+        self.occupied = {}   # label -> bool
+        self.heaps = {}      # lane or (lane, zone) -> [(rank, label), ...]
+        self.queued = {}     # same keys -> labels currently held in that heap
+
+    def distance(self, lane, slot):
+        """Walking distance from a lane to a slot, penalising level changes"""
+        origin = self.lanes[lane]
+        dx = (slot["x"] or 0.0) - origin.get("x", 0.0)
+        dy = (slot["y"] or 0.0) - origin.get("y", 0.0)
+        dl = abs((slot["level"] or 0) - origin.get("level", 0))
+        return math.hypot(dx, dy) + dl * self.level_cost
+
+    def load(self, rows):
+        """Build the indexes from (slot_label, occupied, zone, level, x, y) rows.
+
+        Rows are expected in table order; it breaks ties between equally
+        distant slots, so a site without coordinates behaves like the old
+        "first free row" allocation.
+        """
+        with self.lock:
+            self.slots.clear()
+            self.occupied.clear()
+            self.heaps.clear()
+            self.queued.clear()
+
+            for order, (label, occupied, zone, level, x, y) in enumerate(rows):
+                self.slots[label] = {"zone": zone, "level": level, "x": x, "y": y, "order": order}
+                self.occupied[label] = bool(occupied)
+
+            for lane in self.lanes:
+                for label, slot in self.slots.items():
+                    if self.occupied[label]:
+                        continue
+                    entry = ((self.distance(lane, slot), slot["order"]), label)
+                    self.heaps.setdefault(lane, []).append(entry)
+                    if slot["zone"]:
+                        self.heaps.setdefault((lane, slot["zone"]), []).append(entry)
+
+            for key, heap in self.heaps.items():
+                heapq.heapify(heap)
+                self.queued[key] = {label for _, label in heap}
+
+    def load_from_db(self, conn):
+        c = conn.cursor()
+        c.execute("SELECT slot_label, occupied, zone, level, x, y FROM parking_slots ORDER BY id")
+        self.load(c.fetchall())
+
+    def _peek_free(self, key):
+        heap = self.heaps.get(key)
+        if not heap:
+            return None
+        queued = self.queued[key]
+        while heap:
+            label = heap[0][1]
+            if not self.occupied[label]:
+                return label
+            heapq.heappop(heap)
+            queued.discard(label)
+        return None
+
+    def allocate(self, lane, preferred_zone=None):
+        """Reserve the nearest free slot for a lane, or None if the site is full.
+
+        With a preferred_zone the nearest free slot in that zone wins; if the
+        zone is full we fall back to the nearest slot anywhere.
+        """
+        if lane not in self.lanes:
+            raise KeyError(f"unknown lane: {lane}")
+        with self.lock:
+            label = None
+            if preferred_zone:
+                label = self._peek_free((lane, preferred_zone))
+            if label is None:
+                label = self._peek_free(lane)
+            if label is not None:
+                self.occupied[label] = True
+            return label
+
+    def set_occupied(self, label, occupied):
+        """Sync a slot state change made outside allocate() (exit, sensors)"""
+        with self.lock:
+            if label not in self.slots:
+                return
+            self.occupied[label] = bool(occupied)
+            if occupied:
+                return
+            # re-queue the slot unless a stale entry for it is still in the heap
+            slot = self.slots[label]
+            for lane in self.lanes:
+                entry = ((self.distance(lane, slot), slot["order"]), label)
+                keys = [lane] + ([(lane, slot["zone"])] if slot["zone"] else [])
+                for key in keys:
+                    queued = self.queued.setdefault(key, set())
+                    if label not in queued:
+                        heapq.heappush(self.heaps.setdefault(key, []), entry)
+                        queued.add(label)
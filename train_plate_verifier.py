@@ -0,0 +1,186 @@
+# train_plate_verifier.py
+# Train the HOG + linear SVM candidate verifier (plate_verifier.npz) from a
+# labeled corpus.
+#
+#   python train_plate_verifier.py corpus/labels.csv --out plate_verifier.npz
+#
+# labels.csv has one row per plate: image,x1,y1,x2,y2 (image path relative to
+# the csv, box in pixels). Positives are the labeled boxes plus jittered
+# copies. Negatives are the detector's own geometric candidates that miss every
+# plate, plus random plate-shaped windows, so the SVM learns exactly the
+# grilles/stickers/bumpers that reach OCR today.
+import argparse
+import csv
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from plate_verifier import PlateVerifier, crop_features
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def load_corpus(csv_path, max_width):
+    """{image path: (image, [boxes], scale)}, downscaled like the detector's coarse level"""
+    root = os.path.dirname(os.path.abspath(csv_path))
+    boxes = {}
+    with open(csv_path, newline="") as f:
+        for row in csv.DictReader(f):
+            box = tuple(int(float(row[k])) for k in ("x1", "y1", "x2", "y2"))
+            boxes.setdefault(os.path.join(root, row["image"]), []).append(box)
+    corpus = {}
+    for path, plate_boxes in boxes.items():
+        img = cv2.imread(path)
+        if img is None:
+            print(f"[WARN] cannot read {path}")
+            continue
+        scale = 1.0
+        if max_width and img.shape[1] > max_width:
+            scale = max_width / img.shape[1]
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        corpus[path] = (img, [tuple(int(v * scale) for v in b) for b in plate_boxes], scale)
+    return corpus
+
+def jitter(box, rng, w, h, amount=0.06):
+    x1, y1, x2, y2 = box
+    bw, bh = x2 - x1, y2 - y1
+    dx, dy = rng.uniform(-amount, amount) * bw, rng.uniform(-amount, amount) * bh
+    sw, sh = 1 + rng.uniform(-amount, amount), 1 + rng.uniform(-amount, amount)
+    cx, cy = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+    nb = (int(cx - bw * sw / 2), int(cy - bh * sh / 2), int(cx + bw * sw / 2), int(cy + bh * sh / 2))
+    return (max(0, nb[0]), max(0, nb[1]), min(w, nb[2]), min(h, nb[3]))
+
+def random_window(rng, w, h):
+    bw = rng.randint(60, max(61, w // 3))
+    bh = max(12, int(bw / rng.uniform(2.0, 6.0)))
+    x1, y1 = rng.randint(0, max(0, w - bw)), rng.randint(0, max(0, h - bh))
+    return (x1, y1, x1 + bw, y1 + bh)
+
+def mine_samples(img, plates, rng, candidates, n_jitter=4, n_random=10):
+    h, w = img.shape[:2]
+    pos = list(plates)
+    for box in plates:
+        for _ in range(n_jitter):
+            jb = jitter(box, rng, w, h)
+            if iou(jb, box) > 0.7:
+                pos.append(jb)
+    neg = [c for c in candidates if all(iou(c, p) < 0.3 for p in plates)]
+    for _ in range(n_random):
+        rb = random_window(rng, w, h)
+        if all(iou(rb, p) < 0.3 for p in plates):
+            neg.append(rb)
+    return pos, neg
+
+def detector_candidates(detector, img, scale=1.0):
+    if detector is None:
+        return []
+    merged = detector.merge_overlapping_boxes(detector.find_plate_candidates(img, scale))
+    return [c['bbox'] for c in merged]
+
+def train_linear_svm(X, y, lam=1e-4, epochs=40, batch=64, seed=0):
+    """Class-balanced mini-batch Pegasos; returns (weights, bias)"""
+    rng = np.random.default_rng(seed)
+    n, d = X.shape
+    Xb = np.hstack([X, np.ones((n, 1), dtype=X.dtype)])  # bias as a feature
+    cw = np.where(y > 0, n / (2.0 * (y > 0).sum()), n / (2.0 * (y < 0).sum()))
+    w = np.zeros(d + 1, dtype=np.float64)
+    radius = 1.0 / np.sqrt(lam)
+    t = 0
+    for _ in range(epochs):
+        order = rng.permutation(n)
+        for start in range(0, n, batch):
+            idx = order[start:start + batch]
+            t += 1
+            eta = 1.0 / (lam * t)
+            viol = y[idx] * (Xb[idx] @ w) < 1
+            grad = lam * w
+            if viol.any():
+                sel = idx[viol]
+                grad = grad - (cw[sel, None] * y[sel, None] * Xb[sel]).sum(0) / len(idx)
+            w -= eta * grad
+            norm = np.linalg.norm(w)
+            if norm > radius:
+                w *= radius / norm
+    return w[:-1].astype(np.float32), float(w[-1])
+
+def pick_threshold(scores, y, recall):
+    """Highest threshold that still accepts `recall` of the true plates"""
+    pos = np.sort(scores[y > 0])
+    if len(pos) == 0:
+        return 0.0
+    k = int(np.floor((1.0 - recall) * len(pos)))
+    return float(pos[min(k, len(pos) - 1)])
+
+def build_dataset(corpus, paths, detector, rng):
+    X, y = [], []
+    for path in paths:
+        img, plates, scale = corpus[path]
+        pos, neg = mine_samples(img, plates, rng, detector_candidates(detector, img, scale))
+        if pos:
+            X.append(crop_features(img, pos))
+            y.extend([1] * len(pos))
+        if neg:
+            X.append(crop_features(img, neg))
+            y.extend([-1] * len(neg))
+    return np.vstack(X), np.array(y, dtype=np.float32)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("labels", help="csv with image,x1,y1,x2,y2 rows")
+    ap.add_argument("--out", default="plate_verifier.npz")
+    ap.add_argument("--max-width", type=int, default=1280, help="match server DETECT_MAX_WIDTH")
+    ap.add_argument("--recall", type=float, default=0.98, help="plate recall to keep on validation")
+    ap.add_argument("--val", type=float, default=0.2)
+    ap.add_argument("--lam", type=float, default=1e-4)
+    ap.add_argument("--epochs", type=int, default=40)
+    ap.add_argument("--no-detector", action="store_true",
+                    help="random negatives only (skips loading EasyOCR)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = load_corpus(args.labels, args.max_width)
+    paths = sorted(corpus)
+    rng.shuffle(paths)
+    n_val = max(1, int(len(paths) * args.val)) if len(paths) > 1 else 0
+    val_paths, train_paths = paths[:n_val], paths[n_val:]
+
+    detector = None
+    if not args.no_detector:
+        from improved_model import ImprovedPlateDetectorOCR
+        detector = ImprovedPlateDetectorOCR(verifier_path=None)
+
+    X, y = build_dataset(corpus, train_paths, detector, rng)
+    print(f"train: {len(train_paths)} images, {int((y > 0).sum())} plate / {int((y < 0).sum())} non-plate crops")
+    weights, bias = train_linear_svm(X, y, args.lam, args.epochs, seed=args.seed)
+
+    Xv, yv = build_dataset(corpus, val_paths, detector, rng) if val_paths else (X, y)
+    scores = Xv @ weights + bias
+    threshold = pick_threshold(scores, yv, args.recall)
+    accept = scores >= threshold
+    recall = (accept & (yv > 0)).sum() / max(1, (yv > 0).sum())
+    rejected = (~accept & (yv < 0)).sum() / max(1, (yv < 0).sum())
+    print(f"val: threshold={threshold:.3f} plate recall={recall:.3f} non-plates rejected={rejected:.3f}")
+
+    verifier = PlateVerifier(weights, bias, threshold)
+    verifier.save(args.out)
+    print(f"saved {args.out}")
+
+    # CPU latency per candidate, crop + HOG + score, batched like detect_plate_bbox
+    img, plates, _ = corpus[(val_paths or train_paths)[0]]
+    h, w = img.shape[:2]
+    boxes = (plates + [random_window(rng, w, h) for _ in range(20)])[:20]
+    verifier.scores(img, boxes)
+    runs = 50
+    start = time.perf_counter()
+    for _ in range(runs):
+        verifier.scores(img, boxes)
+    per_candidate = (time.perf_counter() - start) / (runs * len(boxes)) * 1e3
+    print(f"latency: {per_candidate:.3f} ms/candidate (budget 2 ms)")
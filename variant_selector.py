@@ -0,0 +1,77 @@
+# variant_selector.py
+import random
+import threading
+import time
+
+class VariantSelector:
+    """Bandit ordering of OCR preprocessing variants per camera and time of day.
+
+    Each (camera, hour bucket) keeps tries/wins per variant, where a win means
+    the variant's read became the accepted plate. order() ranks variants by a
+    Thompson sample of their Beta(wins+1, losses+1) win-rate and leaves out
+    variants that, after min_tries, win less than drop_below of the time.
+    With probability explore_rate it returns every variant in random order,
+    so dropped variants get re-tested as lighting changes.
+    """
+
+    def __init__(self, variants, bucket_hours=3, explore_rate=0.05,
+                 min_tries=30, drop_below=0.02, seed=None):
+        self.variants = tuple(variants)
+        self.bucket_hours = bucket_hours
+        self.explore_rate = explore_rate
+        self.min_tries = min_tries
+        self.drop_below = drop_below
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}   # (camera, bucket) -> {variant: [tries, wins]}
+
+    def bucket(self, now=None):
+        return time.localtime(now).tm_hour // self.bucket_hours
+
+    def _table(self, camera_id, now):
+        key = (camera_id or "default", self.bucket(now))
+        if key not in self.stats:
+            self.stats[key] = {name: [0, 0] for name in self.variants}
+        return self.stats[key]
+
+    def order(self, camera_id=None, now=None):
+        """Variants to run for the next crop, most promising first"""
+        with self.lock:
+            table = self._table(camera_id, now)
+            if self.rng.random() < self.explore_rate:
+                names = list(self.variants)
+                self.rng.shuffle(names)
+                return names
+            if not any(tries for tries, _ in table.values()):
+                return list(self.variants)
+            ranked = []
+            for name in self.variants:
+                tries, wins = table[name]
+                if tries >= self.min_tries and wins < self.drop_below * tries:
+                    continue
+                ranked.append((self.rng.betavariate(wins + 1, tries - wins + 1), name))
+        ranked.sort(reverse=True)
+        return [name for _, name in ranked] or list(self.variants)
+
+    def record(self, camera_id, tried, winner, now=None):
+        """Count one OCR attempt: every variant in tried ran, winner (or None) won"""
+        with self.lock:
+            table = self._table(camera_id, now)
+            for name in tried:
+                table[name][0] += 1
+            if winner is not None:
+                table[winner][1] += 1
+
+    def snapshot(self):
+        """{camera: {"HH-HH": {variant: {tries, wins, win_rate}}}} for the API"""
+        out = {}
+        with self.lock:
+            for (camera, bucket), table in sorted(self.stats.items()):
+                start = bucket * self.bucket_hours
+                label = f"{start:02d}-{min(24, start + self.bucket_hours):02d}"
+                out.setdefault(camera, {})[label] = {
+                    name: {"tries": tries, "wins": wins,
+                           "win_rate": round(wins / tries, 3) if tries else None}
+                    for name, (tries, wins) in table.items()
+                }
+        return out